@@ -5,18 +5,34 @@ A premium card selector with stateful deck/discard management,
 visual theming, file uploads, weighted selection, and sound effects.
 """
 
+import os
+import secrets
+from typing import Optional, Tuple
+
 import streamlit as st
-# Trigger reload for final logic
-import random
-from typing import Optional
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Local imports
+import profiling
 import styles
-import importlib
-importlib.reload(styles)
-from styles import get_card_styles, render_card, render_card_back, render_discard_item, render_deck_counter, render_card_discarding
+
+# Per-rerun timings (CARD_SELECTOR_PROFILE=1); finished at the end of the script
+profiling.start_run()
+
+# Development mode: hot-reload styles.py on every rerun so CSS/markup edits
+# show up without restarting the server (off in production)
+DEV_MODE = os.environ.get("CARD_SELECTOR_DEV", "").lower() in ("1", "true", "yes")
+if DEV_MODE:
+    import importlib
+    importlib.reload(styles)
+
+from styles import get_card_styles, get_stylesheet_link, render_card, render_card_back, render_discard_pile, render_discard_history, render_deck_counter, render_card_discarding, render_card_grid
 from audio import get_draw_sound_html
-from deck_utils import parse_deck_text, parse_deck_file, get_sample_deck
+from deck_engine import DeckSession, DeckShelf, VersionConflict
+from game_store import get_store
+from rooms import Room, close_room, create_room, get_room
+from deck_library import get_library
+from deck_utils import DeckTable, load_deck_table, parse_column_spec, get_sample_deck
 
 
 # =============================================================================
@@ -29,93 +45,387 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Static assets (stylesheet, sounds) are published to ./static and linked
+# when static serving is enabled, otherwise they are inlined
+STATIC_SERVING = st.get_option("server.enableStaticServing")
+
 # Inject custom CSS
-st.markdown(get_card_styles(), unsafe_allow_html=True)
+with profiling.timed('css'):
+    if STATIC_SERVING:
+        st.markdown(get_stylesheet_link(refresh=DEV_MODE), unsafe_allow_html=True)
+    else:
+        st.markdown(get_card_styles(), unsafe_allow_html=True)
+
+
+# Discard pile: cards shown in the panel, and page size of the full history
+DISCARD_PREVIEW = 10
+HISTORY_PAGE_SIZE = 50
+
+# Cards of the loaded deck listed in the sidebar summary
+DECK_PREVIEW = 8
+
+# "Header row" choices for CSV imports, and the has_header value each passes
+CSV_HEADER_OPTIONS = {'Auto': None, 'Yes': True, 'No': False}
+
+# How often spectators check their room for changes, in seconds
+ROOM_POLL_SECONDS = 1.0
 
 
 # =============================================================================
 # Session State Initialization
 # =============================================================================
+def open_game() -> Tuple[DeckSession, Optional[str]]:
+    """Resume the game named in the URL, or start a new one.
+
+    With persistence on, every game is journaled to the game store and its
+    id kept in the ``game`` query parameter, so a browser refresh or a
+    server restart resumes it from the store.
+
+    Returns:
+        (session, game id), the id being None when persistence is off
+    """
+    store = get_store()
+    if store is None:
+        return DeckSession(), None
+    
+    # Tabs showing the same game share its one live session (see GameStore)
+    game_id = st.query_params.get("game")
+    session = store.open_game(game_id) if game_id else None
+    if session is None:
+        game_id = store.create_game()
+        session = store.open_game(game_id, create=True)
+        st.query_params["game"] = game_id
+    return session, game_id
+
+
+def open_shelved_game(game_id: str) -> Optional[DeckSession]:
+    """Session of a named deck's game, shared with any tab already playing it."""
+    return get_store().open_game(game_id, create=True)
+
+
+@profiling.instrument
 def init_session_state():
     """Initialize all session state variables."""
-    if 'active_deck' not in st.session_state:
-        st.session_state.active_deck = []
-    if 'discard_pile' not in st.session_state:
-        st.session_state.discard_pile = []
-    if 'current_card' not in st.session_state:
-        st.session_state.current_card = None
+    if 'game' not in st.session_state:
+        session, game_id = open_game()
+        store = get_store()
+        st.session_state.game = session
+        # Named decks; the URL's game is the active one, the others are
+        # shelved. With persistence their list is stored with the games and
+        # found again from the URL's game
+        saved = store.load_shelf(game_id) if store is not None else None
+        shelf_id, listing = saved if saved is not None else (game_id, [])
+        decks = DeckShelf(
+            session,
+            name=next((entry[0] for entry in listing if entry[1] == game_id), 'Main'),
+            game_id=game_id,
+            table_loader=store.load_deck if store is not None else None,
+            session_loader=open_shelved_game if store is not None else None
+        )
+        if listing:
+            decks.restore(listing)
+        st.session_state.decks = decks
+        st.session_state.shelf_id = shelf_id
+        st.session_state.active_deck = decks.active
     if 'play_sound' not in st.session_state:
         st.session_state.play_sound = False
-    if 'deck_loaded' not in st.session_state:
-        st.session_state.deck_loaded = False
-    if 'total_cards' not in st.session_state:
-        st.session_state.total_cards = 0
-    if 'show_discard_animation' not in st.session_state:
-        st.session_state.show_discard_animation = False
+    if 'discarding_card' not in st.session_state:
+        # (table, card id): the card is only shown while its deck is played
+        st.session_state.discarding_card = None
+    if 'discard_seen' not in st.session_state:
+        st.session_state.discard_seen = len(st.session_state.game.discard_pile)
+    if 'batch' not in st.session_state:
+        # (table, card ids) of the last batch draw, like discarding_card
+        st.session_state.batch = None
     if 'trigger_draw_animation' not in st.session_state:
         st.session_state.trigger_draw_animation = 0
+    if 'import_message' not in st.session_state:
+        st.session_state.import_message = None
+    if 'room_id' not in st.session_state:
+        # Opening a room link (?room=...) makes this session a spectator
+        st.session_state.room_id = st.query_params.get("room")
+        st.session_state.room_host = False
+        st.session_state.room_seen = -1
+        st.session_state.viewer_id = secrets.token_urlsafe(8)
+    if 'seen_version' not in st.session_state:
+        # Engine version the card table was last rendered at (see act)
+        st.session_state.seen_version = None
 
 
 init_session_state()
 
+# Shared room (see rooms.py): the host plays their own session, spectators
+# watch it instead of a session of their own
+room: Optional[Room] = get_room(st.session_state.room_id) if st.session_state.room_id else None
+if st.session_state.room_id and room is None:
+    st.session_state.room_id = None
+    st.session_state.room_host = False
+    st.query_params.pop("room", None)
+    st.session_state.import_message = ('error', "The room you were watching was closed.")
+spectating = room is not None and not st.session_state.room_host
+game: DeckSession = room.session if spectating else st.session_state.game
+
 
 # =============================================================================
 # Deck Management Functions
 # =============================================================================
-def load_deck(cards: list):
-    """Load a new deck into session state."""
-    st.session_state.active_deck = list(cards)
-    st.session_state.discard_pile = []
-    st.session_state.current_card = None
-    st.session_state.deck_loaded = True
-    st.session_state.total_cards = len(cards)
+# Thin view-side wrappers over the DeckSession engine: the engine owns the
+# deck state, these only add UI effects (sound, animations).
+def act(op, *args):
+    """Run a card table action against the state the user last saw.
+
+    Engine operations are atomic; passing the rendered version also makes a
+    click on outdated controls (a double-click, or the game changing in
+    between) a no-op instead of acting on a state that was never shown.
+
+    Returns:
+        The operation's result, or None if the game had changed
+    """
+    try:
+        result = op(*args, expected_version=st.session_state.seen_version)
+    except VersionConflict:
+        st.toast("The game changed in the meantime; nothing was done.")
+        return None
+    if room is not None:
+        room.touch()
+    return result
+
+
+def load_deck(table: DeckTable, weighted: bool = False):
+    """Load a new deck into the session's engine.
+
+    The (shared) table is not copied; the session only holds card ids.
+    """
+    game.load(table, weighted)
+    st.session_state.discarding_card = None
+    st.session_state.batch = None
+
+
+def import_deck():
+    """Parse the uploaded file or the pasted text into the engine.
+
+    Runs as the Load Deck callback, before the sidebar is drawn, so the text
+    area can be emptied: the parsed deck is kept server-side under its ID
+    (see load_deck_table) and the deck text is not sent back and forth on
+    every later rerun. The outcome is shown through ``import_message``.
+    """
+    state = st.session_state
+    uploaded_file = state.deck_file
+    weighted = state.weighted
+    table = None
+    if uploaded_file is not None:
+        # Stream the uploaded file through the (cached) parser
+        uploaded_file.seek(0)
+        csv_options = {}
+        if uploaded_file.name.lower().endswith('.csv'):
+            csv_options = dict(
+                name_column=parse_column_spec(state.get('name_column', '1')) or 0,
+                weight_column=parse_column_spec(state.get('weight_column', '')),
+                category_column=parse_column_spec(state.get('category_column', '')),
+                has_header=CSV_HEADER_OPTIONS[state.get('csv_has_header', 'Auto')]
+            )
+        try:
+            table = load_deck_table(uploaded_file, uploaded_file.name, weighted, **csv_options)
+        except ValueError as e:
+            state.import_message = ('error', str(e))
+            return
+    elif state.deck_text.strip():
+        # Parse manual input
+        table = load_deck_table(state.deck_text, weighted=weighted)
+        if table:
+            state.deck_text = ""
+    
+    if table:
+        load_deck(table, weighted)
+        state.import_message = ('success', f"Loaded {len(table)} cards!")
+    else:
+        state.import_message = ('error', "No valid cards found!")
+
+
+def open_library_deck():
+    """Load the deck picked from the deck library (Open callback).
+
+    Library decks are read from their prebuilt index through mmap, so even
+    large ones open without parsing (see deck_library).
+    """
+    state = st.session_state
+    name = state.library_deck
+    try:
+        table = get_library().open(name, state.weighted)
+    except KeyError:
+        state.import_message = ('error', f"{name} is no longer in the deck library.")
+        return
+    except ValueError as e:
+        state.import_message = ('error', str(e))
+        return
+    if not table:
+        state.import_message = ('error', "No valid cards found!")
+        return
+    load_deck(table, state.weighted)
+    state.import_message = ('success', f"Loaded {name} with {len(table)} cards!")
 
 
 def discard_current_card():
-    """Discard the current card with animation."""
-    if st.session_state.current_card:
-        st.session_state.show_discard_animation = True
-        return True
-    return False
+    """Discard the current card; the next render plays the discard animation."""
+    with game.lock:  # the card belongs to the deck it was discarded from
+        card_id = act(game.discard)
+        table = game.table
+    if card_id is None:
+        return False
+    st.session_state.discarding_card = (table, card_id)
+    return True
 
 
 def draw_card():
     """Draw a card from the active deck."""
-    if not st.session_state.active_deck:
-        return None
-    
-    # If there's a card currently displayed, move it to history
-    if st.session_state.current_card:
-        st.session_state.discard_pile.append(st.session_state.current_card)
-    
-    # Select a new card randomly
-    selected_card = random.choice(st.session_state.active_deck)
-    
-    if selected_card:
-        # Remove from active deck and set as current
-        st.session_state.active_deck.remove(selected_card)
-        st.session_state.current_card = selected_card
+    selected_card = act(game.draw)
+    if selected_card is not None:
+        st.session_state.batch = None
         st.session_state.play_sound = True
         st.session_state.trigger_draw_animation += 1  # Trigger animation
-    
     return selected_card
 
 
+def draw_batch(count: int):
+    """Draw ``count`` cards at once; they go straight to the discard pile."""
+    with game.lock:  # the batch belongs to the deck it was drawn from
+        drawn = act(game.draw_many, count)
+        table = game.table
+    if drawn:
+        st.session_state.batch = (table, drawn)
+        st.session_state.discarding_card = None
+        st.session_state.play_sound = True
+    return drawn
+
+
 def reset_deck():
     """Reset the deck by moving all cards (discarded + current) back to active deck."""
-    all_cards_to_return = st.session_state.discard_pile.copy()
-    if st.session_state.current_card:
-        all_cards_to_return.append(st.session_state.current_card)
-    
-    if all_cards_to_return:
-        st.session_state.active_deck.extend(all_cards_to_return)
-        st.session_state.discard_pile = []
-        st.session_state.current_card = None
-        random.shuffle(st.session_state.active_deck)
+    if act(game.reset):
+        st.session_state.batch = None
         return True
     return False
 
 
+def reseed_deck(seed: int):
+    """Start the loaded deck over from a given RNG seed."""
+    game.reseed(seed)
+    st.session_state.discarding_card = None
+    st.session_state.batch = None
+
+
+def undo_last_action():
+    """Undo the last draw, discard or reset."""
+    if act(game.undo):
+        st.session_state.discarding_card = None
+        st.session_state.batch = None
+        return True
+    return False
+
+
+def activate_game(session: DeckSession, game_id: Optional[str]):
+    """Make ``session`` the game played (and shown to the room, if hosting)."""
+    state = st.session_state
+    state.game = session
+    if game_id is not None:
+        st.query_params["game"] = game_id
+    state.discarding_card = None
+    state.batch = None
+    state.discard_seen = len(session.discard_pile)
+    state.seen_version = None
+    shared = get_room(state.room_id) if state.room_host else None
+    if shared is not None:
+        shared.set_session(session)
+
+
+def save_decks():
+    """Store the list of named decks with the games, so a refresh restores it."""
+    store = get_store()
+    if store is not None:
+        store.save_shelf(st.session_state.shelf_id, st.session_state.decks.listing())
+
+
+def switch_deck():
+    """Play the deck picked in the sidebar (deck list callback).
+
+    The previous deck is shelved as a compact reference and the picked one
+    restored over its already parsed table, see deck_engine.DeckShelf.
+    """
+    decks: DeckShelf = st.session_state.decks
+    try:
+        session = decks.switch(st.session_state.active_deck)
+    except LookupError as e:
+        st.session_state.active_deck = decks.active
+        st.session_state.import_message = ('error', str(e))
+        return
+    activate_game(session, decks.game_id)
+    save_decks()
+
+
+def deck_caption(name: str) -> str:
+    """Sidebar caption of a named deck: the cards left."""
+    remaining, total = st.session_state.decks.counts(name)
+    return f"{remaining}/{total} cards left" if total else "empty"
+
+
+def add_deck():
+    """Add an empty named deck and switch to it (Add Deck callback)."""
+    decks: DeckShelf = st.session_state.decks
+    name = st.session_state.new_deck_name.strip()
+    if not name:
+        st.session_state.import_message = ('error', "Name the new deck first.")
+        return
+    if name in decks:
+        st.session_state.import_message = ('error', f"There already is a deck named \"{name}\".")
+        return
+    store = get_store()
+    decks.add(name, store.create_game() if store is not None else None)
+    st.session_state.new_deck_name = ""
+    st.session_state.active_deck = name
+    switch_deck()
+
+
+def remove_deck():
+    """Remove the active deck and switch to the previous one (Remove callback)."""
+    decks: DeckShelf = st.session_state.decks
+    names = decks.names()
+    removed = decks.active
+    index = names.index(removed)
+    st.session_state.active_deck = names[index - 1] if index > 0 else names[1]
+    switch_deck()
+    if decks.active != removed:
+        decks.remove(removed)
+        save_decks()
+
+
+def share_room():
+    """Share this session's game as a room that others can watch."""
+    new_room = create_room(game)
+    st.session_state.room_id = new_room.room_id
+    st.session_state.room_host = True
+
+
+def leave_room():
+    """Stop sharing (host) or watching (spectator) the current room."""
+    if st.session_state.room_host:
+        close_room(st.session_state.room_id)
+    st.session_state.room_id = None
+    st.session_state.room_host = False
+    st.query_params.pop("room", None)
+
+
+def rerun_card_table():
+    """Rerun the card table after an action changed it.
+
+    A click inside the card table fragment only reruns the fragment, so the
+    rerun is kept to the fragment as well; during a full script run (e.g. the
+    first run after a sidebar change) the whole script is rerun.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()
+
+
 # =============================================================================
 # Main UI Layout
 # =============================================================================
@@ -128,186 +438,370 @@ st.markdown('<div class="subtitle">Random Selection Made Easy</div>', unsafe_all
 # =============================================================================
 # Sidebar - Deck Setup
 # =============================================================================
-with st.sidebar:
-    st.markdown("## 📚 Deck Setup")
-    
-    # File uploader
-    uploaded_file = st.file_uploader(
-        "Upload Deck File",
-        type=['txt', 'csv'],
-        help="Upload a .txt or .csv file with card names."
-    )
-    
-    # Manual input
-    st.markdown("---")
-    st.markdown("### ✍️ Or Enter Manually")
-    deck_input = st.text_area(
-        "Card List",
-        value=get_sample_deck() if not st.session_state.deck_loaded else "",
-        height=200,
-        help="Enter one card per line."
-    )
-    
-    # Load deck button
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("📥 Load Deck", use_container_width=True):
-            if uploaded_file is not None:
-                # Parse uploaded file with BOM handling
-                content = uploaded_file.read().decode('utf-8-sig')
-                cards = parse_deck_file(content, uploaded_file.name)
-            elif deck_input.strip():
-                # Parse manual input
-                cards = parse_deck_text(deck_input)
-            else:
-                cards = []
-            
-            if cards:
-                load_deck(cards)
-                st.success(f"Loaded {len(cards)} cards!")
+with st.sidebar, profiling.timed('sidebar'):
+    if spectating:
+        # Watching a shared room: the host owns the deck and its setup
+        st.markdown("## 🎥 Watching Room")
+        st.caption(f"Room `{room.room_id}` · {room.viewer_count()} watching")
+        if game.loaded:
+            st.caption(f"{game.total} cards · seed `{game.seed}` · {game.draw_count} cards drawn")
+        st.button("🚪 Leave Room", use_container_width=True, on_click=leave_room)
+    else:
+        st.markdown("## 📚 Deck Setup")
+
+        # Named decks: only the active one is held in full, the others are
+        # listed from their shelved counts
+        decks: DeckShelf = st.session_state.decks
+        st.markdown("### 🗃️ Decks")
+        st.radio(
+            "Active deck",
+            decks.names(),
+            captions=[deck_caption(name) for name in decks.names()],
+            key="active_deck",
+            on_change=switch_deck,
+            label_visibility="collapsed"
+        )
+        with st.expander("➕ New Deck"):
+            st.text_input("Deck name", placeholder="e.g. monsters", key="new_deck_name")
+            st.button("➕ Add Deck", use_container_width=True, on_click=add_deck)
+        if len(decks) > 1:
+            st.button(f"🗑️ Remove \"{decks.active}\"", use_container_width=True, on_click=remove_deck)
+        st.markdown("---")
+
+        # File uploader
+        uploaded_file = st.file_uploader(
+            "Upload Deck File",
+            type=['txt', 'csv'],
+            help="Upload a .txt or .csv file with card names.",
+            key="deck_file"
+        )
+
+        # Manual input (emptied once imported, see import_deck)
+        st.markdown("---")
+        st.markdown("### ✍️ Or Enter Manually")
+        st.text_area(
+            "Card List",
+            height=200,
+            placeholder="One card per line, e.g.\nAce of Spades\nKing of Hearts",
+            help="Enter one card per line.",
+            key="deck_text"
+        )
+
+        weighted = st.checkbox(
+            "⚖️ Weighted Draw",
+            help="Use `Name | weight` lines, or a weight in the second CSV column.",
+            key="weighted"
+        )
+
+        # CSV column selection (only for uploaded CSV files)
+        is_csv = uploaded_file is not None and uploaded_file.name.lower().endswith('.csv')
+        if is_csv:
+            with st.expander("🧾 CSV Columns"):
+                st.caption("Column number (1 = first) or header name.")
+                st.radio(
+                    "Header row", list(CSV_HEADER_OPTIONS), horizontal=True, key="csv_has_header",
+                    help="Auto treats the first row as a header when it names a column "
+                         "(e.g. `name`, `weight`) or has a non-numeric weight."
+                )
+                st.text_input("Name column", value="1", key="name_column")
+                st.text_input("Weight column", value="2" if weighted else "", key="weight_column")
+                st.text_input("Category column", value="", key="category_column")
+
+        # Load deck button
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("📥 Load Deck", use_container_width=True, on_click=import_deck)
+
+        with col2:
+            if st.button("📝 Use Sample", use_container_width=True):
+                table = load_deck_table(get_sample_deck(), weighted=weighted)
+                load_deck(table, weighted)
+                st.session_state.import_message = ('success', f"Loaded sample deck with {len(table)} cards!")
+
+        # Prebuilt decks from the library directory (CARD_SELECTOR_LIBRARY)
+        library_decks = get_library().names()
+        if library_decks:
+            with st.expander("📖 Deck Library"):
+                st.selectbox("Deck", library_decks, key="library_deck")
+                st.button("📂 Open", use_container_width=True, on_click=open_library_deck)
+
+        # Result of the last import, shown once
+        if st.session_state.import_message is not None:
+            kind, message = st.session_state.import_message
+            st.session_state.import_message = None
+            if kind == 'success':
+                st.success(message)
             else:
-                st.error("No valid cards found!")
-    
-    with col2:
-        if st.button("📝 Use Sample", use_container_width=True):
-            cards = parse_deck_text(get_sample_deck())
-            load_deck(cards)
-            st.success(f"Loaded sample deck with {len(cards)} cards!")
+                st.error(message)
+
+        # Summary of the loaded deck; its content stays on the server
+        if game.loaded:
+            table = game.table
+            st.markdown("### 🗂️ Loaded Deck")
+            st.caption(
+                f"{len(table)} cards · {len(table.names)} unique"
+                + (f" · ID `{table.deck_id}`" if table.deck_id else "")
+            )
+            preview = table.head(DECK_PREVIEW)
+            if len(table) > DECK_PREVIEW:
+                preview.append(f"… {len(table) - DECK_PREVIEW} more")
+            st.code("\n".join(preview), language=None)
+
+        # Per-session RNG: the seed plus the sequence of actions replays a game
+        if game.loaded:
+            with st.expander("🎲 Randomness"):
+                st.caption(f"Seed `{game.seed}` · {game.draw_count} cards drawn")
+                seed_input = st.text_input("Seed", value=str(game.seed), help="Restart this deck with a given seed to replay a game.")
+                if st.button("🔁 Restart With Seed", use_container_width=True):
+                    try:
+                        reseed_deck(int(seed_input.strip()))
+                        st.rerun()
+                    except ValueError:
+                        st.error("The seed must be a whole number.")
+
+        # Share this game: others follow it live without a copy of the deck.
+        # An open room keeps its controls even while the host plays an empty deck
+        if game.loaded or room is not None:
+            with st.expander("🎥 Room"):
+                if room is None:
+                    st.caption("Let others watch this game as you play.")
+                    st.button("📡 Share As Room", use_container_width=True, on_click=share_room)
+                else:
+                    st.caption(f"Room `{room.room_id}` · {room.viewer_count()} watching")
+                    st.markdown(f"[Spectator link](?room={room.room_id}) — share the link, or add `?room={room.room_id}` to the app URL.")
+                    st.button("⏹️ Stop Sharing", use_container_width=True, on_click=leave_room)
 
 
 # =============================================================================
 # Main Content Area
 # =============================================================================
 
-# Create columns for layout
-col_left, col_center, col_right = st.columns([1, 2, 1])
-
-# Left Column - Deck Counter and Actions
-with col_left:
-    if st.session_state.deck_loaded:
-        st.markdown(
-            render_deck_counter(
-                len(st.session_state.active_deck),
-                st.session_state.total_cards
-            ),
-            unsafe_allow_html=True
-        )
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        # Discard button (only shown if there's a current card)
-        if st.session_state.current_card and not st.session_state.show_discard_animation:
-            if st.button(
-                "🗑️ Discard Card",
-                use_container_width=True,
-                key="discard_btn"
-            ):
-                if discard_current_card():
-                    st.rerun()
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        # Draw button - disabled if deck is empty OR if there's a current card
-        draw_disabled = len(st.session_state.active_deck) == 0 or st.session_state.current_card is not None
-        
-        # Dynamic button text based on state
-        if len(st.session_state.active_deck) == 0:
-            button_text = "🎴 Deck Empty!"
-        elif st.session_state.current_card is not None:
-            button_text = "🗑️ Discard First!"
-        else:
-            button_text = "🎴 Draw Card"
-        
-        if st.button(
-            button_text,
-            disabled=draw_disabled,
-            use_container_width=True,
-            key="draw_btn"
-        ):
-            draw_card()
-            st.rerun()
-
-# Center Column - Card Display
-with col_center:
-    if st.session_state.deck_loaded:
-        # Check if we're in discarding state
-        if st.session_state.show_discard_animation and st.session_state.current_card:
-            # Show discarding animation
+# The card table is a fragment: draw, discard, undo and reset rerun only this
+# function, so the sidebar (deck text, uploader), stylesheet and footer are
+# neither re-executed nor re-sent on every click
+@st.fragment
+@profiling.instrument(run=True)
+def card_table():
+    """Render the deck counter and actions, the card display and the discard pile."""
+    # Render from one consistent view of the game: other tabs, the room host
+    # or its viewers may act on it while this script run is rendering
+    with game.lock:
+        # Actions clicked on this render apply to the game as rendered (see act)
+        rendered_version = game.version
+        # Card animations restart when this flips, i.e. on every draw of this
+        # game (the same for spectators), but not on unrelated reruns
+        replay_animation = game.draw_count % 2 == 1
+        loaded = game.loaded
+        table = game.table
+        remaining, total = game.remaining, game.total
+        current_card = game.current_card
+        can_undo = game.can_undo
+        pile = game.discard_pile[:]
+
+    # This tab's last batch or discard is dropped once another tab, or the
+    # room host, puts a different deck on the table
+    batch = st.session_state.batch
+    if batch is not None and batch[0] is not table:
+        batch = st.session_state.batch = None
+    discarding = st.session_state.discarding_card
+    if discarding is not None and discarding[0] is not table:
+        discarding = st.session_state.discarding_card = None
+
+    # Create columns for layout
+    col_left, col_center, col_right = st.columns([1, 2, 1])
+
+    # Left Column - Deck Counter and Actions
+    with col_left, profiling.timed('column.left'):
+        if loaded:
             st.markdown(
-                render_card_discarding(st.session_state.current_card),
+                render_deck_counter(
+                    remaining,
+                    total
+                ),
                 unsafe_allow_html=True
             )
-            # Move card to discard pile and clear states
-            st.session_state.discard_pile.append(st.session_state.current_card)
-            st.session_state.current_card = None
-            st.session_state.show_discard_animation = False
-            # Wait for animation to complete before rerunning
-            import time
-            time.sleep(0.7)
-            # Trigger a rerun to show the card back
-            st.rerun()
+        
+            # Spectators watch the host play
+            if not spectating:
+                st.markdown("<br>", unsafe_allow_html=True)
+
+                # Discard button (only shown if there's a current card)
+                if current_card is not None:
+                    if st.button(
+                        "🗑️ Discard Card",
+                        use_container_width=True,
+                        key="discard_btn"
+                    ):
+                        if discard_current_card():
+                            rerun_card_table()
+
+                st.markdown("<br>", unsafe_allow_html=True)
+
+                # Draw button - disabled if deck is empty OR if there's a current card
+                draw_disabled = remaining == 0 or current_card is not None
+
+                # Dynamic button text based on state
+                if remaining == 0:
+                    button_text = "🎴 Deck Empty!"
+                elif current_card is not None:
+                    button_text = "🗑️ Discard First!"
+                else:
+                    button_text = "🎴 Draw Card"
+
+                if st.button(
+                    button_text,
+                    disabled=draw_disabled,
+                    use_container_width=True,
+                    key="draw_btn"
+                ):
+                    draw_card()
+                    rerun_card_table()
+
+                # Batch draw: several cards in one operation
+                if remaining > 1 and current_card is None:
+                    batch_size = st.number_input(
+                        "Cards to draw",
+                        min_value=1,
+                        max_value=remaining,
+                        value=min(5, remaining),
+                        key="batch_size"
+                    )
+                    if st.button(
+                        f"🃏 Draw {batch_size}",
+                        use_container_width=True,
+                        key="draw_batch_btn"
+                    ):
+                        draw_batch(int(batch_size))
+                        rerun_card_table()
+
+                # Undo button
+                if st.button(
+                    "↩️ Undo",
+                    disabled=not can_undo,
+                    use_container_width=True,
+                    key="undo_btn"
+                ):
+                    undo_last_action()
+                    rerun_card_table()
+
+    # Center Column - Card Display
+    with col_center, profiling.timed('column.center'):
+        if loaded:
+            # Check if we're in discarding state
+            if batch is not None:
+                # Show the whole batch as a single grid element
+                _, batch = batch
+                if st.session_state.play_sound:
+                    st.markdown(get_draw_sound_html(inline=not STATIC_SERVING), unsafe_allow_html=True)
+                    st.session_state.play_sound = False
+                st.markdown(
+                    f"<p style='text-align: center; color: rgba(255,255,255,0.6);'>Drew {len(batch)} cards</p>",
+                    unsafe_allow_html=True
+                )
+                st.markdown(render_card_grid(map(table.name, batch)), unsafe_allow_html=True)
             
-        elif st.session_state.current_card:
-            # Play sound effect
-            if st.session_state.play_sound:
-                st.markdown(get_draw_sound_html(), unsafe_allow_html=True)
-                st.session_state.play_sound = False
+            elif discarding is not None:
+                # Show the discard animation once; the card back is revealed by
+                # CSS when it ends, so the script run finishes immediately
+                st.markdown(
+                    render_card_discarding(
+                        table.name(discarding[1]),
+                        replay=replay_animation
+                    ),
+                    unsafe_allow_html=True
+                )
+                st.session_state.discarding_card = None
+                st.markdown(
+                    "<p style='text-align: center; color: rgba(255,255,255,0.5); font-style: italic;'>Draw a card to begin...</p>",
+                    unsafe_allow_html=True
+                )
             
-            # Show the drawn card
-            st.markdown(
-                render_card(st.session_state.current_card),
-                unsafe_allow_html=True
-            )
-        else:
-            # Show card back placeholder
-            st.markdown(render_card_back(), unsafe_allow_html=True)
-            st.markdown(
-                "<p style='text-align: center; color: rgba(255,255,255,0.5); font-style: italic;'>Draw a card to begin...</p>",
-                unsafe_allow_html=True
-            )
-    else:
-        st.markdown(render_card_back(), unsafe_allow_html=True)
-        st.markdown(
-            "<p style='text-align: center; color: rgba(255,255,255,0.5); font-style: italic;'>Load a deck from the sidebar to start</p>",
-            unsafe_allow_html=True
-        )
-
-# Right Column - Discard Pile
-with col_right:
-    if st.session_state.deck_loaded:
-        st.markdown('<div class="discard-pile">', unsafe_allow_html=True)
-        st.markdown('<div class="discard-title">🗑️ Discard Pile</div>', unsafe_allow_html=True)
-        
-        if st.session_state.discard_pile:
-            # Show last 10 discarded cards
-            for card in reversed(st.session_state.discard_pile[-10:]):
-                st.markdown(f'<div class="discard-item">{card}</div>', unsafe_allow_html=True)
+            elif current_card is not None:
+                # Play sound effect
+                if st.session_state.play_sound:
+                    st.markdown(get_draw_sound_html(inline=not STATIC_SERVING), unsafe_allow_html=True)
+                    st.session_state.play_sound = False
             
-            if len(st.session_state.discard_pile) > 10:
+                # Show the drawn card
+                st.markdown(
+                    render_card(
+                        table.name(current_card),
+                        table.category(current_card),
+                        replay=replay_animation
+                    ),
+                    unsafe_allow_html=True
+                )
+            else:
+                # Show card back placeholder
+                st.markdown(render_card_back(), unsafe_allow_html=True)
                 st.markdown(
-                    f'<div class="discard-item" style="color: rgba(255,255,255,0.3);">... and {len(st.session_state.discard_pile) - 10} more</div>',
+                    "<p style='text-align: center; color: rgba(255,255,255,0.5); font-style: italic;'>Draw a card to begin...</p>",
                     unsafe_allow_html=True
                 )
         else:
+            st.markdown(render_card_back(), unsafe_allow_html=True)
             st.markdown(
-                '<div class="discard-item" style="font-style: italic;">No cards discarded yet</div>',
+                "<p style='text-align: center; color: rgba(255,255,255,0.5); font-style: italic;'>Load a deck from the sidebar to start</p>",
                 unsafe_allow_html=True
             )
+
+    # Right Column - Discard Pile
+    with col_right, profiling.timed('column.right'):
+        if loaded:
+            # Last 10 discards as one element; only cards discarded since the
+            # previous render are flagged as new (and animate)
+            new_count = max(0, len(pile) - st.session_state.discard_seen)
+            st.session_state.discard_seen = len(pile)
+            recent = [table.name(card_id) for card_id in reversed(pile[-DISCARD_PREVIEW:])]
+            st.markdown(render_discard_pile(recent, len(pile), new_count), unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+            # Paged history: only one page of names is sent to the browser
+            if len(pile) > DISCARD_PREVIEW:
+                with st.expander(f"📜 Full History ({len(pile)})"):
+                    pages = (len(pile) + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+                    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="history_page")
+                    end = len(pile) - (page - 1) * HISTORY_PAGE_SIZE
+                    start = max(0, end - HISTORY_PAGE_SIZE)
+                    entries = ((i + 1, table.name(pile[i])) for i in range(end - 1, start - 1, -1))
+                    st.markdown(render_discard_history(entries), unsafe_allow_html=True)
         
-        st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("<br>", unsafe_allow_html=True)
         
-        # Reset button
-        reset_disabled = len(st.session_state.discard_pile) == 0 and st.session_state.current_card is None
-        if st.button(
-            "🔄 Reset & Shuffle",
-            disabled=reset_disabled,
-            use_container_width=True
-        ):
-            if reset_deck():
-                st.balloons()
-                st.rerun()
+            if not spectating:
+                # Reset button
+                reset_disabled = len(pile) == 0 and current_card is None
+                if st.button(
+                    "🔄 Reset & Shuffle",
+                    disabled=reset_disabled,
+                    use_container_width=True
+                ):
+                    if reset_deck():
+                        st.balloons()
+                        rerun_card_table()
+
+    st.session_state.seen_version = rendered_version
+
+
+
+# Spectators poll their room: one integer compared per tick, and the page is
+# rerendered only when the host changed something (Streamlit cannot push)
+@st.fragment(run_every=ROOM_POLL_SECONDS)
+def watch_room():
+    """Rerun the page when the watched room changed or closed."""
+    watched = get_room(st.session_state.room_id) if st.session_state.room_id else None
+    if watched is None:
+        st.rerun()
+    watched.touch(st.session_state.viewer_id)
+    if watched.version != st.session_state.room_seen:
+        st.rerun()
+
+
+if spectating:
+    st.session_state.room_seen = room.version
+    room.touch(st.session_state.viewer_id)
+    watch_room()
+
+card_table()
 
 
 # =============================================================================
@@ -318,8 +812,40 @@ st.markdown(
     """
     <div style="text-align: center; color: rgba(255,255,255,0.4); font-size: 0.85rem;">
         <p>💡 <strong>Tips:</strong> Upload a deck file or use the sample deck to get started.</p>
-        <p>Format: One <code>CardName</code> per line.</p>
+        <p>Format: One <code>CardName</code> per line, or <code>CardName | weight</code> for weighted draws.</p>
     </div>
     """,
     unsafe_allow_html=True
 )
+
+
+# =============================================================================
+# Profiling Panel (CARD_SELECTOR_PROFILE=1)
+# =============================================================================
+if profiling.ENABLED:
+    with st.sidebar:
+        with st.expander("⏱️ Profiling"):
+            runs = list(profiling.RECENT_RUNS)
+            if runs:
+                last_run = runs[-1]
+                st.caption(f"Last run ({last_run.label}): {last_run.seconds * 1e3:.1f} ms · {len(runs)} recent runs")
+                st.dataframe(profiling.summarize(runs), hide_index=True, use_container_width=True)
+            else:
+                st.caption("No finished runs yet.")
+            
+            if st.button("📈 Profile Next Rerun", use_container_width=True):
+                profiling.request_profile()
+                st.rerun()
+            
+            profiles = [run.profile for run in runs if run.profile]
+            if profiles:
+                with open(profiles[-1], 'rb') as f:
+                    st.download_button(
+                        "💾 Download Profile",
+                        f.read(),
+                        file_name=os.path.basename(profiles[-1]),
+                        use_container_width=True
+                    )
+                st.caption("Open with `python -m pstats` or snakeviz.")
+
+profiling.finish_run()
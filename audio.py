@@ -1,66 +1,212 @@
 """
 Audio utilities for the card selector application.
-Contains base64-encoded sound effects and HTML audio generators.
+Builds, validates and publishes sound effects as cached static assets.
 """
 
-# Base64-encoded card draw sound effect (short swoosh/flip sound)
-# This is a minimal WAV file encoded in base64
-DRAW_SOUND_BASE64 = """
-UklGRnoGAABXQVZFZm10IBAAAAABAAEAQB8AAEAfAAABAAgAZGF0YVoGAACAgICAgICAgICAgICAgICA
-gICAgICAgICAgICAf3+AgICAgH9/f39/f39/f4CAgICAgICAgICAgICAgH9/f3+AgICAgICAgH9/f4CA
-gH9/gICAgICAgH9/f39/f4CAgH9/gICAf39/f4CAgICAgH9/f39/f4B/f4B/f3+AgH9/f4CAgH9/gICA
-gH9/gIB/gH9/f4B/f4CAf3+Af3+AgIB/gH+Af39/gH+Af4CAgH+AgIB/gH9/f4B/f4CAf4B/gIB/gH+A
-gICAgH+Af39/gH9/gH9/f4CAf4CAgH+Af4CAf4CAgH+Af4B/gH+Af4CAgIB/gH+AgH+AgICAf4B/gH+A
-gIB/gICAf4CAgH+AgIB/gICAf4CAgH+AgIB/gICAf4CAgICAgICAgICAf4CAgH+AgIB/gICAf4CAgH+A
-gIB/gICAf4CAgH+AgIB/gH+Af4B/gH+Af4B/gH+Af4B/gH+Af4B/gH+Af4B/gH+Af4B/gIB/gICAf4CA
-gH+AgIB/gICAf4CAgH+AgIB/gICAgICAgICAgICAgICAf4CAgH+AgIB/gICAf4CAgH+AgIB/gIB/gH+A
-gH+Af4CAgH+AgIB/gICAgICAgICAgICAgICAgIB/gH+Af4CAf4B/gH+Af4B/gH+Af4CAgICAgICAgICA
-gICAgICAgH+AgH+Af4B/gH+Af4B/gH+Af4B/gH+Af4B/gH+AgICAgICAgICAgH+AgH+Af4B/gIB/gH+A
-f4B/gH+Af4B/gH+Af4B/gH+AgH+AgICAgICAgICAgICAgICAgICAgICAgICAf4B/gH+Af4B/gIB/gH+A
-gH+Af4B/gICAgH+Af4CAgICAgICAgICAgH+AgH+AgH+Af4B/gH+Af4B/gH+Af4CAf4CAgICAgICAf4CA
-gICAgICAgICAgICAgICAgH+Af4B/gH+Af4B/gH+Af4CAgH+Af4CAgH+AgICAgICAgICAgICAgICAf4CA
-gH+AgH+AgH+Af4B/gH+Af4CAf4CAgICAgICAgICAgICAgICAgICAgICAgICAgH+AgH+AgH+Af4B/gH+A
-f4B/gH+AgICAgICAgICAgICAgICAgICAgICAgICAf4CAgH+Af4B/gH+Af4B/gH+Af4CAgICAgICAgICA
-gICAgICAgICAgICAgICAgICAgH+AgH+AgH+Af4B/gH+Af4CAgICAgICAgICAgICAgICAgICAgICAgICA
-gICAgICAgICAgH+AgH+Af4B/gH+AgH+AgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgH+AgH+A
-gH+Af4B/gICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgH+AgH+AgH+AgICAgICAgICA
-gICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICAgICA
-"""
+import base64
+import hashlib
+import io
+import logging
+import math
+import os
+import random
+import wave
+from typing import Dict, Optional, Tuple
 
-# Alternative: A more reliable approach using a simple beep tone
-# This creates a short "card flip" sound effect
-CARD_FLIP_SOUND = """
-data:audio/wav;base64,UklGRl9vT19teleW6tbW1tbW1tbW1tbW1tbW1tbW1tfX19fX19fX19fX19fX2NjY2NjY2NjY2NjY
-2dnZ2dnZ2dnZ2dnZ2tra2tra2tra2tra2tra29vb29vb29vb29vb29vb29vc3Nzc3Nzc3Nzc3N3d3d3d3d3d
-3d3d3d7e3t7e3t7e3t7e3t7e39/f39/f39/f39/f4ODg4ODg4ODg4ODg4OHh4eHh4eHh4eHh4uLi4uLi4uLi
-4uLi4+Pj4+Pj4+Pj4+Pj5OTk5OTk5OTk5OTk5eXl5eXl5eXl5eXl5ubm5ubm5ubm5ubm5+fn5+fn5+fn5+fn
-6Ojo6Ojo6Ojo6Ojo6enp6enp6enp6enp6urq6urq6urq6urq6+vr6+vr6+vr6+vr7Ozs7Ozs7Ozs7Ozs7e3t
-7e3t7e3t7e3t7u7u7u7u7u7u7u7u7+/v7+/v7+/v7+/v8PDw8PDw8PDw8PDw8fHx8fHx8fHx8fHx8vLy8vLy
-8vLy8vLy8/Pz8/Pz8/Pz8/Pz9PT09PT09PT09PT09fX19fX19fX19fX19vb29vb29vb29vb29/f39/f39/f3
-9/f3+Pj4+Pj4+Pj4+Pj4+fn5+fn5+fn5+fn5+vr6+vr6+vr6+vr6+/v7+/v7+/v7+/v7/Pz8/Pz8/Pz8/Pz8
-/f39/f39/f39/f39/v7+/v7+/v7+/v7+////
-"""
+from styles import STATIC_DIR, STATIC_URL
+
+logger = logging.getLogger('card_selector.audio')
+
+# Sound effects used by the app; a sound pack may provide any of them
+SOUND_NAMES = ('draw', 'shuffle')
+
+# Supported sound file types and their MIME types
+AUDIO_TYPES = {
+    '.wav': 'audio/wav',
+    '.ogg': 'audio/ogg',
+    '.mp3': 'audio/mpeg',
+}
+
+# Directory of an alternative sound pack (e.g. draw.wav, shuffle.ogg)
+SOUND_PACK_DIR = os.environ.get('CARD_SELECTOR_SOUND_PACK', '')
+
+# Largest sound file accepted from a sound pack
+MAX_SOUND_BYTES = 1 << 20
+
+# Validated sounds and their published file names, built once per process
+_sounds: Optional[Dict[str, Tuple[bytes, str]]] = None
+_published: Dict[str, str] = {}
+
+
+def _to_wav(samples, rate: int) -> bytes:
+    """Encode samples in [-1, 1] as an 8-bit mono WAV file."""
+    frames = bytes(int(128 + 127 * max(-1.0, min(1.0, s))) for s in samples)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(1)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _flip_samples(rate: int, duration: float, rng: random.Random):
+    """Yield a short, decaying burst of filtered noise (a card flick)."""
+    smoothed = 0.0
+    for i in range(int(rate * duration)):
+        smoothed = smoothed * 0.6 + rng.uniform(-1.0, 1.0) * 0.4
+        yield 0.8 * math.exp(-i / (rate * 0.018)) * smoothed
 
 
-def get_draw_sound_html() -> str:
+def synthesize_flip_sound(rate: int = 22050) -> bytes:
+    """Return the built-in card flip sound as WAV bytes."""
+    return _to_wav(_flip_samples(rate, 0.09, random.Random(7)), rate)
+
+
+def synthesize_shuffle_sound(rate: int = 22050) -> bytes:
+    """Return the built-in shuffle sound (a quick riffle of flips) as WAV bytes."""
+    rng = random.Random(11)
+    samples = []
+    for _ in range(6):
+        samples.extend(_flip_samples(rate, 0.045, rng))
+        samples.extend([0.0] * int(rate * 0.015))
+    return _to_wav(samples, rate)
+
+
+def validate_sound(data: bytes, extension: str):
     """
-    Generate HTML for playing the card draw sound effect.
-    Uses a short synthesized sound that works across browsers.
+    Check that sound data is a well-formed file of the given type.
+
+    Args:
+        data: Raw file contents
+        extension: File extension including the dot (e.g. '.wav')
+
+    Raises:
+        ValueError: If the data is empty, too large or malformed
     """
-    return f"""
-    <audio autoplay>
-        <source src="{CARD_FLIP_SOUND}" type="audio/wav">
-    </audio>
+    if not data:
+        raise ValueError("sound file is empty")
+    if len(data) > MAX_SOUND_BYTES:
+        raise ValueError(f"sound file exceeds {MAX_SOUND_BYTES} bytes")
+
+    if extension == '.wav':
+        try:
+            with wave.open(io.BytesIO(data)) as wav:
+                frames = wav.getnframes()
+                expected = frames * wav.getnchannels() * wav.getsampwidth()
+                if not frames or len(wav.readframes(frames)) != expected:
+                    raise ValueError("WAV data is truncated")
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"invalid WAV file: {e}") from e
+    elif extension == '.ogg':
+        if not data.startswith(b'OggS'):
+            raise ValueError("invalid Ogg file")
+    elif extension == '.mp3':
+        if not (data.startswith(b'ID3') or data[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2')):
+            raise ValueError("invalid MP3 file")
+    else:
+        raise ValueError(f"unsupported sound type '{extension}'")
+
+
+def load_sound_pack(directory: str) -> Dict[str, Tuple[bytes, str]]:
     """
+    Load and validate the sounds found in a sound pack directory.
+
+    Each sound is looked up as ``<name>.wav``, ``<name>.ogg`` or
+    ``<name>.mp3``; missing files are skipped, and invalid ones are
+    skipped with a logged warning.
 
+    Args:
+        directory: Path of the sound pack
 
-def get_shuffle_sound_html() -> str:
+    Returns:
+        Mapping of sound name to (data, extension)
     """
-    Generate HTML for playing a shuffle sound effect.
+    sounds = {}
+    for name in SOUND_NAMES:
+        for extension in AUDIO_TYPES:
+            path = os.path.join(directory, name + extension)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read(MAX_SOUND_BYTES + 1)
+            try:
+                validate_sound(data, extension)
+            except ValueError as e:
+                logger.warning("Skipping sound pack file %s: %s", path, e)
+                continue
+            sounds[name] = (data, extension)
+            break
+    return sounds
+
+
+def get_sounds() -> Dict[str, Tuple[bytes, str]]:
+    """
+    Return the validated sounds, loading them on first use.
+
+    Sounds from ``CARD_SELECTOR_SOUND_PACK`` take precedence over the
+    built-in synthesized ones.
+    """
+    global _sounds
+    if _sounds is None:
+        sounds = {
+            'draw': (synthesize_flip_sound(), '.wav'),
+            'shuffle': (synthesize_shuffle_sound(), '.wav'),
+        }
+        if SOUND_PACK_DIR:
+            sounds.update(load_sound_pack(SOUND_PACK_DIR))
+        _sounds = sounds
+    return _sounds
+
+
+def publish_sound(name: str, static_dir: str = STATIC_DIR) -> str:
+    """
+    Write a sound to a content-hashed file under ``static_dir/audio``.
+
+    Returns:
+        The file's path relative to ``static_dir``
+    """
+    if name not in _published:
+        data, extension = get_sounds()[name]
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        relative = f"audio/{name}.{digest}{extension}"
+        path = os.path.join(static_dir, relative)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        _published[name] = relative
+    return _published[name]
+
+
+def get_sound_html(name: str, inline: bool = False) -> str:
     """
-    # Using the same base sound for now, could be customized
-    return f"""
-    <audio autoplay>
-        <source src="{CARD_FLIP_SOUND}" type="audio/wav">
-    </audio>
+    Generate HTML that plays a sound effect once.
+
+    Args:
+        name: One of SOUND_NAMES
+        inline: Embed the sound as a data URI instead of referencing the
+            published static file (for when static serving is off)
+    """
+    data, extension = get_sounds()[name]
+    if inline:
+        src = f"data:{AUDIO_TYPES[extension]};base64,{base64.b64encode(data).decode('ascii')}"
+    else:
+        src = f"{STATIC_URL}/{publish_sound(name)}"
+    return f'<audio autoplay src="{src}"></audio>'
+
+
+def get_draw_sound_html(inline: bool = False) -> str:
+    """
+    Generate HTML for playing the card draw sound effect.
+    """
+    return get_sound_html('draw', inline)
+
+
+def get_shuffle_sound_html(inline: bool = False) -> str:
+    """
+    Generate HTML for playing a shuffle sound effect.
     """
+    return get_sound_html('shuffle', inline)
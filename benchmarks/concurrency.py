@@ -0,0 +1,148 @@
+"""
+Concurrent stress test of one DeckSession shared between threads.
+
+Worker threads hammer a single session with draws, batch draws, discards,
+resets and undos, as the script runs of several tabs or room viewers
+would. A checker thread repeatedly takes the session lock and verifies
+that no card was lost or duplicated: the cards left in the deck, the
+discard pile and the current card always add up to the full deck, with
+every card id appearing at most once outside the deck.
+
+With ``--cas`` the workers act the way the app does: they read the
+session version, then pass it as ``expected_version``, so an operation
+loses (VersionConflict) when another thread got there first.
+
+Usage:
+    python benchmarks/concurrency.py [--threads 8] [--seconds 3] [--cards 10000] [--weighted] [--cas]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_engine import DeckSession, VersionConflict  # noqa: E402
+from deck_utils import load_deck_table  # noqa: E402
+
+# Relative frequency of each operation in the workers' mix
+OPERATIONS = (
+    ('draw', 40),
+    ('discard', 30),
+    ('draw_many', 10),
+    ('undo', 15),
+    ('reset', 5),
+)
+
+
+def make_session(cards: int, weighted: bool) -> DeckSession:
+    """Load a deck of ``cards`` distinct cards into a new session."""
+    text = "\n".join(f"Card {i} | {i % 5 + 1}" for i in range(cards))
+    return DeckSession(load_deck_table(text, weighted=weighted), weighted=weighted, seed=1)
+
+
+def check(session: DeckSession) -> str:
+    """Return a description of a conservation violation, or '' if none."""
+    with session.lock:
+        held = array('I', session.discard_pile)
+        if session.current_card is not None:
+            held.append(session.current_card)
+        remaining = session.remaining
+        total = session.total
+    if remaining + len(held) != total:
+        return f"{remaining} in deck + {len(held)} held != {total} cards"
+    if len(set(held)) != len(held):
+        return f"duplicate card ids among {len(held)} held cards"
+    return ''
+
+
+def worker(session: DeckSession, stop: threading.Event, cas: bool, seed: int, counts: list, failures: list):
+    """Run random operations until ``stop`` is set; count done and conflicting ones."""
+    rng = random.Random(seed)
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    done = conflicts = 0
+    while not stop.is_set():
+        for name in rng.choices(names, weights, k=64):
+            op = getattr(session, name)
+            args = (rng.randint(1, 8),) if name == 'draw_many' else ()
+            try:
+                if cas:
+                    op(*args, expected_version=session.version)
+                else:
+                    op(*args)
+                done += 1
+            except VersionConflict:
+                conflicts += 1
+            except Exception as e:  # an operation saw a torn state
+                failures.append(f"{name} raised {e!r}")
+                stop.set()
+                break
+    counts.append((done, conflicts))
+
+
+def checker(session: DeckSession, stop: threading.Event, failures: list, checks: list):
+    """Verify conservation until ``stop`` is set."""
+    count = 0
+    while not stop.is_set():
+        failure = check(session)
+        count += 1
+        if failure:
+            failures.append(failure)
+            stop.set()
+        time.sleep(0.001)
+    checks.append(count)
+
+
+def run(threads: int, seconds: float, cards: int, weighted: bool, cas: bool) -> bool:
+    """Run the stress test and print its results; return whether it passed."""
+    session = make_session(cards, weighted)
+    stop = threading.Event()
+    counts, failures, checks = [], [], []
+    workers = [
+        threading.Thread(target=worker, args=(session, stop, cas, seed, counts, failures))
+        for seed in range(threads)
+    ]
+    watcher = threading.Thread(target=checker, args=(session, stop, failures, checks))
+
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    watcher.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in workers + [watcher]:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    failure = check(session)
+    if failure:
+        failures.append(failure)
+    done = sum(d for d, _ in counts)
+    conflicts = sum(c for _, c in counts)
+    print(f"{threads} threads, {cards} cards{' (weighted)' if weighted else ''}{', CAS' if cas else ''}: "
+          f"{done:,} operations in {elapsed:.2f}s ({done / elapsed:,.0f} ops/s), "
+          f"{conflicts:,} conflicts, version {session.version:,}, {checks[0]:,} checks")
+    for failure in failures:
+        print(f"FAILED {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--cards', type=int, default=10_000)
+    parser.add_argument('--weighted', action='store_true')
+    parser.add_argument('--cas', action='store_true', help="act on the version read before each operation")
+    args = parser.parse_args()
+    if not run(args.threads, args.seconds, args.cards, args.weighted, args.cas):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Pure-Python vs NumPy deck backends at different deck sizes.
+
+Times a reset, 1,000 single draws and one bulk draw of 10% of the deck for
+Deck (array('I') + swap-and-pop) and NumpyDeck (swap-and-pop, with batch
+draws vectorized), next to the old list-based reset (extend +
+random.shuffle) for reference.
+
+Usage:
+    python benchmarks/deck_backends.py [--sizes 10000 1000000 10000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_utils import Deck, DeckTable, NumpyDeck, np  # noqa: E402
+
+
+def timed(func, *args) -> float:
+    """Return the seconds taken by one call."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def legacy_reset(size: int) -> float:
+    """Time the old reset: extend the active list with the discards and shuffle."""
+    active = [f"c{i}" for i in range(size // 2)]
+    discards = [f"c{i}" for i in range(size // 2, size)]
+
+    def reset():
+        active.extend(discards)
+        random.shuffle(active)
+    return timed(reset)
+
+
+def bench_deck(deck, size: int) -> dict:
+    """Time the deck operations on an already built deck."""
+    results = {'reset': timed(deck.reset)}
+    results['draw x1000'] = timed(lambda: [deck.draw_id() for _ in range(1000)])
+    deck.reset()
+    results['draw 10%'] = timed(deck.draw_many_ids, size // 10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    print(f"{'cards':>10} {'backend':<8} {'reset':>10} {'draw x1000':>11} {'draw 10%':>10}")
+    for size in args.sizes:
+        table = DeckTable(tuple(f"c{i}" for i in range(size)), array('I', range(size)))
+        print(f"{size:>10} {'legacy':<8} {legacy_reset(size) * 1e3:>8.2f}ms {'-':>11} {'-':>10}")
+        backends = [('python', Deck)]
+        if np is not None:
+            backends.append(('numpy', NumpyDeck))
+        for label, cls in backends:
+            deck = cls(table, random.Random(0))
+            results = bench_deck(deck, size)
+            print(
+                f"{size:>10} {label:<8} {results['reset'] * 1e3:>8.2f}ms "
+                f"{results['draw x1000'] * 1e3:>9.2f}ms {results['draw 10%'] * 1e3:>8.2f}ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Discard throughput of the Streamlit app within one process.
+
+Simulates users with Streamlit's AppTest harness: each user loads the
+sample deck and then repeatedly draws and discards a card. Every click is a
+full script run, as it would be on the server. AppTest is not thread-safe,
+so users run one after another and throughput is reported per script-runner
+thread; a server process multiplies it by its number of concurrent runs.
+
+Usage:
+    python benchmarks/discard_throughput.py [--users N] [--discards N]
+"""
+
+import argparse
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def click(app: AppTest, label: str):
+    """Click the first button whose label contains ``label``."""
+    for button in app.button:
+        if label in button.label:
+            button.click().run()
+            if app.exception:
+                raise RuntimeError(app.exception)
+            return
+    raise LookupError(label)
+
+
+def user_session(discards: int) -> float:
+    """Run one simulated user; return the seconds spent discarding."""
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.run()
+    click(app, 'Use Sample')
+    spent = 0.0
+    for _ in range(discards):
+        if not app.session_state['game'].remaining:
+            click(app, 'Reset')
+        click(app, 'Draw Card')
+        start = time.perf_counter()
+        click(app, 'Discard Card')
+        spent += time.perf_counter() - start
+    return spent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--discards', type=int, default=10)
+    args = parser.parse_args()
+
+    spent = [user_session(args.discards) for _ in range(args.users)]
+
+    total = args.users * args.discards
+    print(f"users={args.users} discards={total}")
+    print(f"mean discard latency {sum(spent) / total * 1000:8.1f} ms")
+    print(f"discard throughput   {total / sum(spent):8.1f} /s per script thread")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Render calls per second for the card HTML helpers in styles.py.
+
+Each helper is called repeatedly with a realistic card name (one that needs
+HTML escaping) and the best of several timing runs is reported.
+
+Usage:
+    python benchmarks/render_calls.py [--number N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import styles  # noqa: E402
+
+CARD_NAME = "Queen of Hearts & Spades <Promo>"
+RECENT = [f"{CARD_NAME} #{i}" for i in range(10)]
+
+CALLS = [
+    ('render_card', lambda: styles.render_card(CARD_NAME, "Royals")),
+    ('render_card_discarding', lambda: styles.render_card_discarding(CARD_NAME)),
+    ('render_discard_item', lambda: styles.render_discard_item(CARD_NAME, new=True)),
+    ('render_discard_pile (10)', lambda: styles.render_discard_pile(RECENT, 25, 1)),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for label, call in CALLS:
+        best = min(timeit.repeat(call, number=args.number, repeat=args.repeat))
+        print(f"{label:<26} {args.number / best:>12,.0f} calls/s  {best / args.number * 1e6:6.2f} us/call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Per-rerun overhead of the app's module-level setup.
+
+Streamlit re-executes app.py on every interaction. This times the work that
+runs at the top of each rerun, in production mode (cached stylesheet link)
+and in development mode (styles reload + stylesheet republish).
+
+Usage:
+    python benchmarks/rerun_overhead.py [--runs N]
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import styles  # noqa: E402
+
+
+def rerun_production():
+    """Top-of-script work with CARD_SELECTOR_DEV unset."""
+    styles.get_stylesheet_link()
+
+
+def rerun_development():
+    """Top-of-script work with CARD_SELECTOR_DEV=1."""
+    importlib.reload(styles)
+    styles.get_stylesheet_link(refresh=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=1000)
+    args = parser.parse_args()
+
+    # The stylesheet is published to static/ (git-ignored), as in the app
+    for label, func in (('production', rerun_production), ('development', rerun_development)):
+        func()  # warm up
+        seconds = timeit.timeit(func, number=args.runs) / args.runs
+        print(f"{label:<12} {seconds * 1e6:10.1f} us/rerun")
+
+if __name__ == '__main__':
+    main()
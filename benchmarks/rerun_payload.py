@@ -0,0 +1,102 @@
+"""
+Bytes sent to the browser per draw.
+
+Drives the app with Streamlit's AppTest harness and totals the serialized
+size of every ForwardMsg the script runner emits (what the server writes to
+the websocket) while a card is drawn and discarded. A click on a widget
+inside a fragment is replayed as the browser sends it: as a rerun of that
+fragment only, rather than of the whole script.
+
+The sidebar text area holds the deck text, so ``--lines`` controls how big
+it is; the sample deck is loaded either way.
+
+Usage:
+    python benchmarks/rerun_payload.py [--draws N] [--lines N]
+"""
+
+import argparse
+import os
+from unittest import mock
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.runtime.scriptrunner import RerunData
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Running byte count of emitted messages, and the fragments to rerun next
+sent = [0]
+fragment_ids = []
+
+
+def _counting_enqueue(enqueue):
+    def wrapper(self, msg):
+        sent[0] += msg.ByteSize()
+        return enqueue(self, msg)
+    return wrapper
+
+
+def _fragment_rerun_data(**kwargs):
+    """RerunData for the next click: fragment-scoped if the widget is in one."""
+    if fragment_ids:
+        kwargs['fragment_id_queue'] = list(fragment_ids)
+    return RerunData(**kwargs)
+
+
+def click(app: AppTest, label: str, in_fragment: bool = False) -> int:
+    """
+    Click the first button whose label contains ``label``.
+
+    Args:
+        app: The running app
+        label: Part of the button label
+        in_fragment: Whether the button is in the main area, where the app
+            (if it uses fragments) only reruns the card table
+
+    Returns:
+        Bytes sent to the browser for the click, including any st.rerun()
+    """
+    for button in app.button:
+        if label in button.label:
+            fragment_ids[:] = list(app._fragment_storage._fragments) if in_fragment else []
+            before = sent[0]
+            button.click().run()
+            fragment_ids.clear()
+            if app.exception:
+                raise RuntimeError(app.exception)
+            return sent[0] - before
+    raise LookupError(label)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--draws', type=int, default=20)
+    parser.add_argument('--lines', type=int, default=0,
+                        help="lines of deck text in the sidebar (default: the sample deck)")
+    args = parser.parse_args()
+
+    with mock.patch.object(ForwardMsgQueue, 'enqueue', _counting_enqueue(ForwardMsgQueue.enqueue)), \
+            mock.patch.object(local_script_runner, 'RerunData', _fragment_rerun_data):
+        app = AppTest.from_file(APP_PATH, default_timeout=60)
+        app.run()
+        if args.lines:
+            app.text_area[0].set_value("\n".join(f"Card {i}" for i in range(args.lines))).run()
+            click(app, 'Load Deck')
+        else:
+            click(app, 'Use Sample')
+
+        draw = discard = 0
+        for _ in range(args.draws):
+            if not app.session_state['game'].remaining:
+                click(app, 'Reset', in_fragment=True)
+            draw += click(app, 'Draw Card', in_fragment=True)
+            discard += click(app, 'Discard Card', in_fragment=True)
+
+    print(f"fragments: {'yes' if app._fragment_storage._fragments else 'no'}  draws={args.draws}")
+    print(f"bytes per draw    {draw / args.draws:10.0f}")
+    print(f"bytes per discard {discard / args.draws:10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+"""
+Benchmark suite for deck parsing, the deck library index and the draw/reset operations.
+
+Generates synthetic decks of 1k, 100k and 10M lines (with comments, blank
+lines, CRLF line endings and a BOM, as TXT and as CSV) and reports the
+throughput and peak memory of each operation. Throughput is the median of
+several timed runs; peak memory is measured in a separate, traced run, so
+tracing does not slow down the timings.
+
+Results can be stored as baselines and later runs compared against them;
+an operation regresses when its throughput drops, or its peak memory
+grows, by more than the tolerance.
+
+Usage:
+    python benchmarks/suite.py [--sizes 1000 100000 10000000] [--only NAME ...]
+    python benchmarks/suite.py --save      # store the results as baselines
+    python benchmarks/suite.py --check     # exit with 1 on a regression
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_engine import DeckSession  # noqa: E402
+from deck_library import read_index, write_index  # noqa: E402
+from deck_utils import (  # noqa: E402
+    PARSE_CACHE, load_deck_table, np, parse_card_line, parse_deck_file,
+    parse_deck_table, parse_deck_text, random_card_choice
+)
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Bump when the generated decks change, so stale cached files are not reused
+DATA_VERSION = 1
+
+RANKS = ('Ace', 'King', 'Queen', 'Jack', '10', '9', '8', '7', '6', '5', '4', '3', '2')
+SUITS = ('Spades', 'Hearts', 'Diamonds', 'Clubs')
+
+# Lines fed to parse_card_line, and calls of the per-call operations
+LINE_SAMPLE = 1_000_000
+CALLS = 10_000
+
+# Upper bound on the timed runs of one operation, and the largest deck
+# size whose operations get an untimed warm-up run first
+MAX_RUNS = 1000
+WARMUP_MAX_SIZE = 100_000
+
+
+# =============================================================================
+# Synthetic decks
+# =============================================================================
+def _deck_rows(size: int):
+    """Yield (kind, name, weight, category) for ``size`` deterministic lines."""
+    rng = random.Random(size)
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.04:
+            yield 'comment', f"# Section {i}", None, None
+        elif roll < 0.08:
+            yield 'blank', ' ' * rng.randint(0, 2), None, None
+        else:
+            name = f"{rng.choice(RANKS)} of {rng.choice(SUITS)} ({i % 1000})"
+            if roll > 0.98:
+                name += ', foil'  # quoted in the CSV
+            yield 'card', name, rng.randint(1, 5), rng.choice(SUITS)
+
+
+def generate_decks(size: int, data_dir: str):
+    """
+    Write the TXT and CSV decks for ``size`` lines, unless already cached.
+
+    Both files are UTF-8 with a BOM and CRLF line endings.
+
+    Returns:
+        (txt_path, csv_path)
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    txt_path = os.path.join(data_dir, f"deck-{size}-v{DATA_VERSION}.txt")
+    csv_path = os.path.join(data_dir, f"deck-{size}-v{DATA_VERSION}.csv")
+    if os.path.exists(txt_path) and os.path.exists(csv_path):
+        return txt_path, csv_path
+
+    with open(txt_path + '.tmp', 'w', encoding='utf-8-sig', newline='\r\n') as txt, \
+            open(csv_path + '.tmp', 'w', encoding='utf-8-sig', newline='\r\n') as csv:
+        csv.write("name,weight,category\n")
+        for kind, name, weight, category in _deck_rows(size):
+            if kind == 'blank':
+                txt.write(f"{name}\n")
+                csv.write("\n")
+            elif kind == 'comment':
+                txt.write(f"{name}\n")
+                csv.write(f"{name}\n")
+            else:
+                txt.write(f"{name}\n")
+                csv.write(f'"{name}",{weight},{category}\n')
+    os.replace(txt_path + '.tmp', txt_path)
+    os.replace(csv_path + '.tmp', csv_path)
+    return txt_path, csv_path
+
+
+# =============================================================================
+# Operations
+# =============================================================================
+# Each operation is (name, setup, run): setup(ctx) prepares untimed state
+# and returns (state, items), run(state) is the measured work and items the
+# number of lines or calls it processes. Inputs that a run does not modify
+# are kept in ctx and shared by the runs at one size.
+def _lines_sample(ctx):
+    if 'lines' not in ctx:
+        with open(ctx['txt'], encoding='utf-8-sig') as f:
+            ctx['lines'] = [line.rstrip('\n') for _, line in zip(range(LINE_SAMPLE), f)]
+    return ctx['lines'], len(ctx['lines'])
+
+
+def _parse_lines(lines):
+    for line in lines:
+        parse_card_line(line)
+
+
+def _deck_text(ctx):
+    if 'text' not in ctx:
+        with open(ctx['txt'], encoding='utf-8', newline='') as f:
+            ctx['text'] = f.read()
+    return ctx['text'], ctx['size']
+
+
+def _parse_txt_file(path):
+    with open(path, 'rb') as f:
+        parse_deck_file(f, 'deck.txt')
+
+
+def _parse_csv_file(path):
+    with open(path, 'rb') as f:
+        parse_deck_file(f, 'deck.csv')
+
+
+def _uncached_path(ctx):
+    PARSE_CACHE.clear()
+    return ctx['txt'], ctx['size']
+
+
+def _load_table(path):
+    with open(path, 'rb') as f:
+        load_deck_table(f, 'deck.txt')
+
+
+def _card_list(ctx):
+    if 'cards' not in ctx:
+        ctx['cards'] = _table(ctx).head(len(_table(ctx)))
+    return ctx['cards'], CALLS
+
+
+def _choose(cards):
+    for _ in range(CALLS):
+        random_card_choice(cards)
+
+
+def _table(ctx):
+    if 'table' not in ctx:
+        with open(ctx['txt'], 'rb') as f:
+            ctx['table'] = load_deck_table(f, 'deck.txt')
+    return ctx['table']
+
+
+def _fresh_session(ctx):
+    session = DeckSession(_table(ctx), seed=1)
+    return session, min(CALLS, session.total)
+
+
+def _draw_discard(session):
+    for _ in range(min(CALLS, session.total)):
+        session.draw()
+        session.discard()
+
+
+def _batch_session(ctx):
+    session = DeckSession(_table(ctx), seed=1)
+    return session, session.total // 10
+
+
+def _draw_tenth(session):
+    session.draw_many(session.total // 10)
+
+
+def _played_session(ctx):
+    session = DeckSession(_table(ctx), seed=1)
+    session.draw_many(session.total // 2)
+    return session, session.total
+
+
+def _reset(session):
+    session.reset()
+
+
+def _index_path(ctx):
+    return f"{ctx['txt']}.deck"
+
+
+def _build_index(path):
+    with open(path, 'rb') as f:
+        write_index(parse_deck_table(f, 'deck.txt'), f"{path}.deck")
+
+
+def _built_index(ctx):
+    if 'index' not in ctx:
+        _build_index(ctx['txt'])
+        ctx['index'] = _index_path(ctx)
+    return ctx['index'], ctx['size']
+
+
+def _open_index(path):
+    table = read_index(path)
+    table.name(len(table.names) - 1)
+
+
+OPERATIONS = [
+    ('parse_card_line', _lines_sample, _parse_lines),
+    ('parse_deck_text', _deck_text, parse_deck_text),
+    ('parse_deck_file.txt', lambda ctx: (ctx['txt'], ctx['size']), _parse_txt_file),
+    ('parse_deck_file.csv', lambda ctx: (ctx['csv'], ctx['size']), _parse_csv_file),
+    ('load_deck_table', _uncached_path, _load_table),
+    ('random_card_choice', _card_list, _choose),
+    ('session.draw+discard', _fresh_session, _draw_discard),
+    ('session.draw_many', _batch_session, _draw_tenth),
+    ('session.reset', _played_session, _reset),
+    ('deck_library.index', lambda ctx: (ctx['txt'], ctx['size']), _build_index),
+    ('deck_library.open', _built_index, _open_index),
+]
+
+
+# =============================================================================
+# Measurement
+# =============================================================================
+def time_operation(setup, run, ctx, min_time: float, repeat: int) -> tuple:
+    """
+    Return (median seconds per run, items).
+
+    Runs at least ``repeat`` times, and keeps going until ``min_time``
+    seconds have been measured (at most MAX_RUNS runs).
+    """
+    times = []
+    total = 0.0
+    if ctx['size'] <= WARMUP_MAX_SIZE:
+        state, _ = setup(ctx)
+        run(state)
+        del state
+    gc.collect()
+    while len(times) < repeat or (total < min_time and len(times) < MAX_RUNS):
+        state, items = setup(ctx)
+        start = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - start
+        del state
+        times.append(elapsed)
+        total += elapsed
+        if elapsed > min_time * 5:
+            break
+    return statistics.median(times), items
+
+
+def peak_memory(setup, run, ctx) -> int:
+    """Return the peak bytes allocated by one traced run, beyond its setup."""
+    state, _ = setup(ctx)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        run(state)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+        del state
+
+
+def run_suite(sizes, only, data_dir: str, min_time: float, repeat: int) -> dict:
+    """Measure every selected operation at every size."""
+    results = {}
+    for size in sizes:
+        txt_path, csv_path = generate_decks(size, data_dir)
+        ctx = {'size': size, 'txt': txt_path, 'csv': csv_path}
+        for name, setup, run in OPERATIONS:
+            if only and name not in only:
+                continue
+            seconds, items = time_operation(setup, run, ctx, min_time, repeat)
+            peak = peak_memory(setup, run, ctx)
+            results[f"{size}/{name}"] = {
+                'seconds': seconds,
+                'throughput': items / seconds if seconds else 0.0,
+                'peak_bytes': peak,
+            }
+            print(f"{size:>10} {name:<22} {items / seconds:>14,.0f} items/s "
+                  f"{seconds * 1e3:>10.2f} ms {peak / 2 ** 20:>9.1f} MiB", flush=True)
+        ctx.clear()
+    return results
+
+
+def environment() -> dict:
+    """Describe what the results were measured on."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__ if np is not None else None,
+    }
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> list:
+    """Return descriptions of the operations that regressed against the baselines."""
+    regressions = []
+    for key, result in results.items():
+        base = baselines.get(key)
+        if base is None:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['throughput']:,.0f}/s vs baseline {base['throughput']:,.0f}/s"
+            )
+        if result['peak_bytes'] > base['peak_bytes'] * (1 + tolerance) + 4096:
+            regressions.append(
+                f"{key}: peak memory {result['peak_bytes']:,} B vs baseline {base['peak_bytes']:,} B"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 10_000_000])
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help="operations to run: " + ", ".join(name for name, _, _ in OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per operation")
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help="keep timing an operation for at least this many seconds")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'card_selector_bench'),
+                        help="where generated decks are cached")
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--save', action='store_true', help="store the results as the new baselines")
+    parser.add_argument('--check', action='store_true', help="exit with 1 if an operation regressed")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="allowed relative throughput drop or peak memory growth")
+    args = parser.parse_args()
+
+    print(f"{'lines':>10} {'operation':<22} {'throughput':>22} {'time':>13} {'peak':>13}")
+    results = run_suite(args.sizes, args.only, args.data_dir, args.min_time, args.repeat)
+
+    stored = {'environment': None, 'results': {}}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            stored = json.load(f)
+
+    if args.save:
+        stored['environment'] = environment()
+        stored['results'].update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"saved {len(results)} baselines to {args.baselines}")
+        return
+
+    if stored['environment'] and stored['environment'] != environment():
+        print(f"note: baselines were measured on {stored['environment']}")
+    if not stored['results']:
+        print(f"no baselines in {args.baselines}; run with --save to store them")
+        return
+    regressions = compare(results, stored['results'], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("no regressions against the baselines")
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
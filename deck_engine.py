@@ -0,0 +1,531 @@
+"""
+Headless deck engine for the card selector application.
+Holds the state of one game (deck, current card, discard pile) and its
+operations, independent of Streamlit.
+"""
+
+import functools
+import pickle
+import random
+import secrets
+import threading
+import zlib
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from deck_utils import DeckTable, get_deck_table, make_deck
+
+
+class VersionConflict(Exception):
+    """An operation expected a different session version than the current one."""
+
+    def __init__(self, expected: int, actual: int):
+        super().__init__(f"session is at version {actual}, expected {expected}")
+        self.expected = expected
+        self.actual = actual
+
+
+def _atomic(method):
+    """
+    Run a DeckSession operation under the session's lock.
+
+    The wrapped operation also accepts a keyword-only ``expected_version``:
+    when given, the operation only runs if the session is still at that
+    version (compare-and-swap) and raises VersionConflict otherwise.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, expected_version: Optional[int] = None, **kwargs):
+        # acquire/release rather than ``with``: about half the overhead
+        lock = self.lock
+        lock.acquire()
+        try:
+            if expected_version is not None and expected_version != self.version:
+                raise VersionConflict(expected_version, self.version)
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release()
+    return wrapper
+
+
+class DeckSession:
+    """
+    State and operations for a single game.
+
+    Cards are tracked as ids into the loaded DeckTable. Every operation is
+    recorded on a bounded undo stack, so the last few draws, discards and
+    resets can be reverted.
+
+    Each session draws from its own ``random.Random`` seeded with ``seed``
+    and reseeded on every load, so a game can be replayed exactly from the
+    seed, the deck and the sequence of operations. When ``journal`` is set,
+    it is called as ``journal(session, op, args)`` after every operation
+    that changed the state, which is enough to replay the game (see
+    game_store.GameStore).
+
+    Operations are atomic: each runs under ``lock``, so a session can be
+    shared between threads (script runs of several tabs or viewers), and
+    each one that changes the state bumps ``version``. Passing
+    ``expected_version=`` to an operation applies it only if the session has
+    not changed since that version was read (see VersionConflict). Reading
+    several properties consistently while other threads operate requires
+    holding ``lock``.
+    """
+
+    def __init__(
+        self,
+        table: Optional[DeckTable] = None,
+        weighted: bool = False,
+        seed: Optional[int] = None,
+        undo_limit: int = 100,
+        backend: str = 'auto'
+    ):
+        """
+        Create a session.
+
+        Args:
+            table: Deck to load, or None to start empty
+            weighted: Whether to draw proportionally to card weights
+            seed: RNG seed, or None for a random one
+            undo_limit: Number of operations that can be undone
+            backend: Deck implementation for unweighted decks (see
+                deck_utils.make_deck)
+        """
+        self.backend = backend
+        self.seed = seed if seed is not None else secrets.randbits(64)
+        self.rng = random.Random()
+        self.journal: Optional[Callable[['DeckSession', str, tuple], None]] = None
+        self.lock = threading.RLock()
+        self.version = 0
+        self._undo = deque(maxlen=undo_limit)
+        self._load(table if table is not None else DeckTable((), array('I')), weighted)
+
+    # -------------------------------------------------------------------------
+    # State
+    # -------------------------------------------------------------------------
+    @property
+    def table(self) -> DeckTable:
+        """The loaded deck's shared table."""
+        return self.deck.table
+
+    @property
+    def loaded(self) -> bool:
+        """Whether a non-empty deck is loaded."""
+        return self.total > 0
+
+    @property
+    def remaining(self) -> int:
+        """Number of cards left to draw."""
+        return len(self.deck)
+
+    @property
+    def total(self) -> int:
+        """Number of cards in the full deck."""
+        return self.deck.total
+
+    @property
+    def current_card(self) -> Optional[int]:
+        """Id of the card currently shown, or None."""
+        return self._current
+
+    @property
+    def discard_pile(self) -> array:
+        """Ids of discarded cards, oldest first (do not mutate)."""
+        return self._discards
+
+    @property
+    def can_undo(self) -> bool:
+        """Whether there is an operation to undo."""
+        return bool(self._undo)
+
+    def name(self, card_id: int) -> str:
+        """Return the name of a card id."""
+        return self.deck.table.name(card_id)
+
+    def rng_state(self) -> tuple:
+        """Snapshot the RNG state (a few microseconds; safe to do per draw)."""
+        return self.rng.getstate()
+
+    def set_rng_state(self, state: tuple):
+        """Restore an RNG state taken with rng_state()."""
+        self.rng.setstate(state)
+
+    @_atomic
+    def export_state(self) -> dict:
+        """
+        Capture the full game state, including the undo history (but not
+        the table itself). Its size grows with the cards played, plus one
+        copy of the cards left in the deck.
+
+        Returns:
+            A picklable dict for restore_state()
+        """
+        generator = getattr(self.deck, 'generator', None)
+        return {
+            'seed': self.seed,
+            'weighted': self.weighted,
+            'draw_count': self.draw_count,
+            'rng': self.rng.getstate(),
+            'generator': generator.bit_generator.state if generator is not None else None,
+            'deck': self.deck.snapshot(),
+            'current': self._current,
+            'discards': array('I', self._discards),
+            'undo': list(self._undo),
+        }
+
+    def restore_state(self, table: DeckTable, state: dict):
+        """
+        Restore a state taken with export_state() over the same table.
+        """
+        self.seed = state['seed']
+        self._load(table, state['weighted'])
+        self.draw_count = state['draw_count']
+        self.rng.setstate(state['rng'])
+        if state['generator'] is not None:
+            self.deck.generator.bit_generator.state = state['generator']
+        self.deck.restore(state['deck'])
+        self._current = state['current']
+        self._discards = array('I', state['discards'])
+        self._undo.extend(state['undo'])
+
+    def _log(self, op: str, *args):
+        """Publish a state change: bump the version and report it to the journal."""
+        self.version += 1
+        if self.journal is not None:
+            self.journal(self, op, args)
+
+    # -------------------------------------------------------------------------
+    # Operations
+    # -------------------------------------------------------------------------
+    @_atomic
+    def load(self, table: DeckTable, weighted: bool = False):
+        """Load a new deck, clearing the current card, discards and undo history."""
+        self._load(table, weighted)
+        self._log('load', weighted, self.seed)
+
+    def _load(self, table: DeckTable, weighted: bool):
+        """Load a deck without reporting it to the journal."""
+        self.weighted = weighted
+        self.rng.seed(self.seed)
+        self.draw_count = 0
+        self.deck = make_deck(table, weighted, self.rng, self.backend)
+        self._current = None
+        self._discards = array('I')
+        self._undo.clear()
+
+    @_atomic
+    def reseed(self, seed: Optional[int] = None):
+        """
+        Start the loaded deck over with a new seed.
+
+        Args:
+            seed: RNG seed, or None for a random one
+        """
+        self.seed = seed if seed is not None else secrets.randbits(64)
+        self._load(self.table, self.weighted)
+        self._log('reseed', self.seed)
+
+    @_atomic
+    def draw(self) -> Optional[int]:
+        """
+        Draw a random card, moving any current card to the discard pile.
+
+        Returns:
+            The drawn card id, or None if the deck is empty
+        """
+        card_id = self.deck.draw_id()
+        if card_id is None:
+            return None
+
+        self.draw_count += 1
+        previous = self._current
+        if previous is not None:
+            self._discards.append(previous)
+        self._current = card_id
+        self._undo.append(('draw', previous))
+        self._log('draw')
+        return card_id
+
+    @_atomic
+    def draw_many(self, count: int) -> array:
+        """
+        Draw several cards at once, sending them straight to the discard pile.
+
+        Any current card is discarded first; the batch does not become the
+        current card.
+
+        Args:
+            count: Number of cards to draw (capped at the cards left)
+
+        Returns:
+            array('I') of drawn card ids, in draw order
+        """
+        drawn = self.deck.draw_many_ids(count)
+        if not drawn:
+            return drawn
+
+        self.draw_count += len(drawn)
+        previous = self._current
+        if previous is not None:
+            self._discards.append(previous)
+        self._current = None
+        self._discards.extend(drawn)
+        self._undo.append(('draw_many', (previous, len(drawn))))
+        self._log('draw_many', len(drawn))
+        return drawn
+
+    @_atomic
+    def discard(self) -> Optional[int]:
+        """
+        Move the current card to the discard pile.
+
+        Returns:
+            The discarded card id, or None if there is no current card
+        """
+        card_id = self._current
+        if card_id is None:
+            return None
+
+        self._discards.append(card_id)
+        self._current = None
+        self._undo.append(('discard', None))
+        self._log('discard')
+        return card_id
+
+    @_atomic
+    def reset(self) -> bool:
+        """
+        Return the current card and all discards to the deck.
+
+        Returns:
+            True if anything was returned
+        """
+        if not self._discards and self._current is None:
+            return False
+
+        # Only the returned cards are kept: undo takes them out again, so
+        # the undo history never holds a copy of the deck
+        self._undo.append(('reset', (self._current, self._discards)))
+        self.deck.reset()
+        self._current = None
+        self._discards = array('I')
+        self._log('reset')
+        return True
+
+    @_atomic
+    def undo(self) -> bool:
+        """
+        Revert the most recent draw, batch draw, discard or reset.
+
+        Returns:
+            True if an operation was undone
+        """
+        if not self._undo:
+            return False
+
+        op, data = self._undo.pop()
+        if op == 'draw':
+            self.deck.put_back(self._current)
+            if data is not None:
+                self._discards.pop()
+            self._current = data
+        elif op == 'draw_many':
+            previous, count = data
+            drawn = self._discards[len(self._discards) - count:]
+            del self._discards[len(self._discards) - count:]
+            for card_id in reversed(drawn):
+                self.deck.put_back(card_id)
+            if previous is not None:
+                self._discards.pop()
+            self._current = previous
+        elif op == 'discard':
+            self._current = self._discards.pop()
+        else:
+            self._current, self._discards = data
+            held = self._discards
+            if self._current is not None:
+                held = held + array('I', [self._current])
+            self.deck.remove_ids(held)
+        self._log('undo')
+        return True
+
+
+class ShelvedDeck:
+    """A named deck that is not being played: a reference to its table and its packed state."""
+
+    __slots__ = ('deck_id', 'remaining', 'total', 'state', 'table', 'game_id')
+
+    def __init__(self, deck_id: str = '', remaining: int = 0, total: int = 0,
+                 state: Optional[bytes] = None, table: Optional[DeckTable] = None,
+                 game_id: Optional[str] = None):
+        self.deck_id = deck_id
+        self.remaining = remaining
+        self.total = total
+        self.state = state  # compressed export_state(), None if empty or loaded by game id
+        self.table = table  # only kept when the table cannot be looked up again
+        self.game_id = game_id
+
+
+class DeckShelf:
+    """
+    Several named decks (e.g. "monsters", "loot", "events"), one played at a time.
+
+    The active deck is a full DeckSession. The others are shelved as
+    compact references: the id of their shared table plus their compressed
+    exported state (which includes the draw order, so nothing is redrawn).
+    A shelved deck becomes a session again only when it is switched to,
+    restoring it over its already parsed table: switching never reparses a
+    deck. Tables are looked up by id (get_deck_table(), then
+    ``table_loader``); without a loader, a shelved deck keeps its table.
+
+    With a ``session_loader``, decks that have a game id are not packed at
+    all: their game is kept elsewhere (e.g. journaled to a game store, and
+    possibly played by other sessions meanwhile), and switching to one asks
+    the loader for its session.
+    """
+
+    def __init__(
+        self,
+        session: DeckSession,
+        name: str = 'Main',
+        game_id: Optional[str] = None,
+        table_loader: Optional[Callable[[str], Optional[DeckTable]]] = None,
+        session_loader: Optional[Callable[[str], Optional[DeckSession]]] = None
+    ):
+        """
+        Create a shelf holding one deck.
+
+        Args:
+            session: The first deck's session, which becomes the active one
+            name: Name of the first deck
+            game_id: Caller-defined id of the first deck's game (e.g. its
+                game store id), handed back by ``game_id``
+            table_loader: Fallback lookup of a table by deck id (e.g.
+                game_store.GameStore.load_deck)
+            session_loader: Lookup of the session of a game id (e.g.
+                game_store.GameStore.open_game), or None if the game cannot
+                be restored
+        """
+        self.active = name
+        self.session = session
+        self.game_id = game_id
+        self.table_loader = table_loader
+        self.session_loader = session_loader
+        self._decks: Dict[str, Optional[ShelvedDeck]] = {name: None}  # None: the active deck
+
+    def names(self) -> List[str]:
+        """Names of all decks, in the order they were added."""
+        return list(self._decks)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._decks
+
+    def __len__(self) -> int:
+        return len(self._decks)
+
+    def counts(self, name: str) -> Tuple[int, int]:
+        """Return (cards left, total cards) of a deck, without loading it."""
+        shelved = self._decks[name]
+        if shelved is None:
+            return self.session.remaining, self.session.total
+        return shelved.remaining, shelved.total
+
+    def listing(self) -> List[Tuple[str, Optional[str], int, int]]:
+        """Return (name, game id, cards left, total cards) of every deck, in order."""
+        listing = []
+        for name, shelved in self._decks.items():
+            if shelved is None:
+                listing.append((name, self.game_id, self.session.remaining, self.session.total))
+            else:
+                listing.append((name, shelved.game_id, shelved.remaining, shelved.total))
+        return listing
+
+    def add(self, name: str, game_id: Optional[str] = None):
+        """
+        Add an empty deck (it stays shelved until switched to).
+
+        Raises:
+            ValueError: If a deck of that name exists
+        """
+        if name in self._decks:
+            raise ValueError(f"a deck named {name!r} already exists")
+        self._decks[name] = ShelvedDeck(game_id=game_id)
+
+    def restore(self, listing: Iterable[Tuple[str, Optional[str], int, int]]):
+        """
+        Replace the shelved decks with those of a listing() (e.g. one saved
+        in a game store), in its order.
+
+        The decks are shelved by game id only, so this needs a
+        ``session_loader``. The active deck keeps its place in the listing,
+        or goes last if it is not in it.
+        """
+        decks: Dict[str, Optional[ShelvedDeck]] = {}
+        for name, game_id, remaining, total in listing:
+            if name == self.active:
+                decks[name] = None
+            elif name not in decks:
+                decks[name] = ShelvedDeck(remaining=remaining, total=total, game_id=game_id)
+        decks.setdefault(self.active, None)
+        self._decks = decks
+
+    def remove(self, name: str):
+        """
+        Remove a shelved deck.
+
+        Raises:
+            ValueError: If ``name`` is the active deck
+        """
+        if name == self.active:
+            raise ValueError("the active deck cannot be removed; switch to another deck first")
+        del self._decks[name]
+
+    def switch(self, name: str) -> DeckSession:
+        """
+        Shelve the active deck and make ``name`` the active one.
+
+        Returns:
+            The session of the now active deck
+
+        Raises:
+            KeyError: If there is no deck of that name
+            LookupError: If the deck's table or game can no longer be found
+        """
+        if name == self.active:
+            return self.session
+        shelved = self._decks[name]
+        session = self._unshelve(shelved)
+        self._decks[self.active] = self._shelve(self.session, self.game_id)
+        self._decks[name] = None
+        self.active, self.session, self.game_id = name, session, shelved.game_id
+        return session
+
+    def _shelve(self, session: DeckSession, game_id: Optional[str]) -> ShelvedDeck:
+        """Pack a session into a ShelvedDeck."""
+        if not session.loaded:
+            return ShelvedDeck(game_id=game_id)
+        table = session.table
+        if self.session_loader is not None and game_id is not None:
+            return ShelvedDeck(table.deck_id, session.remaining, session.total, game_id=game_id)
+        state = zlib.compress(pickle.dumps(session.export_state(), protocol=pickle.HIGHEST_PROTOCOL), 1)
+        keep_table = self.table_loader is None or not table.deck_id
+        return ShelvedDeck(table.deck_id, session.remaining, session.total, state,
+                           table if keep_table else None, game_id)
+
+    def _unshelve(self, shelved: ShelvedDeck) -> DeckSession:
+        """Restore a session from a ShelvedDeck."""
+        if self.session_loader is not None and shelved.game_id is not None:
+            session = self.session_loader(shelved.game_id)
+            if session is None:
+                raise LookupError(f"game {shelved.game_id} can no longer be restored")
+            return session
+        session = DeckSession()
+        if shelved.state is None:
+            return session
+        table = shelved.table or get_deck_table(shelved.deck_id)
+        if table is None and self.table_loader is not None:
+            table = self.table_loader(shelved.deck_id)
+        if table is None:
+            raise LookupError(f"deck {shelved.deck_id} is no longer available")
+        session.restore_state(table, pickle.loads(zlib.decompress(shelved.state)))
+        return session
@@ -0,0 +1,363 @@
+"""
+Deck library for the card selector application.
+Serves the .txt and .csv decks of a directory from a prebuilt binary index:
+each deck is parsed once into an offsets table plus a names blob and later
+opened through mmap, so opening even a multi-million card deck is close to
+instant and its pages are shared by every server process through the OS
+page cache instead of being copied into each one.
+"""
+
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from deck_utils import DeckTable, get_deck_table, parse_deck_table, register_deck_table
+
+# Directory of library decks
+LIBRARY_DIR = os.environ.get(
+    'CARD_SELECTOR_LIBRARY',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'decks')
+)
+
+# Where the binary index is kept (a cache: safe to delete)
+INDEX_DIR = os.environ.get(
+    'CARD_SELECTOR_LIBRARY_INDEX',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'library')
+)
+
+# The directory is rescanned (one stat per file) at most this often
+RESCAN_SECONDS = 2.0
+
+DECK_EXTENSIONS = ('.txt', '.csv')
+
+# Header cells naming the category column of a library CSV deck
+CATEGORY_HEADERS = ('category', 'categories', 'type')
+
+# Index file layout, in native byte order (the index is a local cache):
+#   header     magic, flags, n_names, n_cards, blob_bytes
+#   offsets    (n_names + 1) x uint64, byte offsets of the names in the blob
+#   card_ids   n_cards x uint32, padded to 8 bytes
+#   weights    n_cards x float64, weighted decks only
+#   blob       the UTF-8 names, back to back, padded to 8 bytes
+#   categories decks with categories only: (n_names + 1) x uint64 offsets
+#              and a blob, as for the names ('' for a name without one)
+_MAGIC = b'CSDECK02'
+_HEADER = struct.Struct('=8sIxxxxQQQ')
+_WEIGHTED = 1
+_CATEGORIES = 2
+
+_ID_PREFIX = 'lib-'
+
+
+class MappedNames:
+    """
+    Read-only sequence of card names decoded on access from a names blob.
+
+    Indexing decodes a single name, so a deck of millions of names costs
+    nothing until its cards are shown.
+    """
+
+    __slots__ = ('_blob', '_offsets')
+
+    def __init__(self, blob: memoryview, offsets: memoryview):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        offsets = self._offsets
+        return str(self._blob[offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+class MappedCategories(MappedNames):
+    """MappedNames of card categories, with None for a card without one."""
+
+    __slots__ = ()
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return super().__getitem__(index) or None
+
+
+def _encode_strings(strings) -> tuple:
+    """Encode strings for an index: (offsets, encoded strings, blob size)."""
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = array('Q', [0])
+    position = 0
+    for string in encoded:
+        position += len(string)
+        offsets.append(position)
+    return offsets, encoded, position
+
+
+def write_index(table: DeckTable, path: str):
+    """
+    Write a table to an index file (atomically, via a temporary file).
+
+    Args:
+        table: The parsed deck
+        path: Destination file
+    """
+    offsets, encoded, position = _encode_strings(table.names)
+    card_ids = array('I', table.card_ids)
+    flags = _WEIGHTED if table.weights is not None else 0
+    if table.categories is not None:
+        flags |= _CATEGORIES
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, flags, len(encoded), len(card_ids), position))
+        offsets.tofile(f)
+        card_ids.tofile(f)
+        f.write(b'\0' * (-len(card_ids) * card_ids.itemsize % 8))
+        if table.weights is not None:
+            array('d', table.weights).tofile(f)
+        for name in encoded:
+            f.write(name)
+        if table.categories is not None:
+            f.write(b'\0' * (-position % 8))
+            category_offsets, categories, _ = _encode_strings(
+                category or '' for category in table.categories
+            )
+            category_offsets.tofile(f)
+            for category in categories:
+                f.write(category)
+    os.replace(temporary, path)
+
+
+def read_index(path: str, deck_id: str = '') -> DeckTable:
+    """
+    Open an index file as a DeckTable backed by a read-only memory map.
+
+    Only the header is read; names, card ids and weights stay in the mapped
+    file until used.
+
+    Raises:
+        ValueError: If the file is not an index file (of this format version)
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, flags, name_count, card_count, blob_bytes = _HEADER.unpack_from(mapped, 0)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a deck index")
+
+    view = memoryview(mapped)
+    position = _HEADER.size
+    offsets = view[position:position + 8 * (name_count + 1)].cast('Q')
+    position += 8 * (name_count + 1)
+    card_ids = view[position:position + 4 * card_count].cast('I')
+    position += 4 * card_count
+    position += -position % 8
+    weights = None
+    if flags & _WEIGHTED:
+        weights = view[position:position + 8 * card_count].cast('d')
+        position += 8 * card_count
+    names = MappedNames(view[position:position + blob_bytes], offsets)
+    position += blob_bytes
+    position += -position % 8
+    categories = None
+    if flags & _CATEGORIES:
+        category_offsets = view[position:position + 8 * (name_count + 1)].cast('Q')
+        position += 8 * (name_count + 1)
+        categories = MappedCategories(view[position:position + category_offsets[-1]], category_offsets)
+    return DeckTable(names, card_ids, weights, categories, deck_id)
+
+
+def _csv_options(path: str) -> dict:
+    """Column options for a library CSV deck: its category column, if its header names one."""
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        for row in csv.reader(f, skipinitialspace=True):
+            if row and not row[0].startswith('#'):
+                for cell in row:
+                    if cell.strip().lower() in CATEGORY_HEADERS:
+                        return {'category_column': cell}
+                break
+    return {}
+
+
+def _file_hash(path: str) -> str:
+    """Hash a file's content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_library_deck(deck_id: str) -> bool:
+    """Whether a deck id names a library deck (see DeckLibrary.load_deck)."""
+    return deck_id.startswith(_ID_PREFIX)
+
+
+class DeckLibrary:
+    """
+    The decks of a directory, indexed on first use.
+
+    Each source file is tracked in a manifest by its mtime, size and
+    content hash. A deck is parsed only when it is first opened (separately
+    for weighted and unweighted play) and its index is rebuilt only when
+    the file's mtime or size changed and a rehash shows that its content
+    did too. Index files are named after the content hash, so server
+    processes sharing the index directory share them as well.
+
+    Opened decks get a ``deck_id`` derived from the content hash, under
+    which load_deck() reopens them, so games can refer to library decks
+    without storing their content.
+    """
+
+    def __init__(self, directory: str = LIBRARY_DIR, index_dir: str = INDEX_DIR):
+        """
+        Create a library.
+
+        Args:
+            directory: Directory of .txt and .csv decks
+            index_dir: Directory for the index files and their manifest
+        """
+        self.directory = directory
+        self.index_dir = index_dir
+        self._manifest_path = os.path.join(index_dir, 'manifest.json')
+        self._lock = threading.Lock()
+        self._files: Dict[str, dict] = {}
+        self._scanned = 0.0
+        if os.path.exists(self._manifest_path):
+            try:
+                with open(self._manifest_path) as f:
+                    self._files = json.load(f)
+            except (OSError, ValueError):
+                self._files = {}
+
+    def names(self) -> List[str]:
+        """File names of the library's decks, sorted."""
+        with self._lock:
+            self._scan()
+            return sorted(self._files)
+
+    def open(self, name: str, weighted: bool = False) -> DeckTable:
+        """
+        Open a library deck, building its index if needed.
+
+        The index is rebuilt if it was written in an older format. CSV decks
+        keep their categories when their header names a category column
+        (one of CATEGORY_HEADERS).
+
+        Args:
+            name: File name of the deck in the library directory
+            weighted: Whether to parse card weights
+
+        Returns:
+            The shared, memory-mapped DeckTable (do not mutate)
+
+        Raises:
+            KeyError: If there is no such deck
+            ValueError: If the deck cannot be parsed
+        """
+        with self._lock:
+            self._scan(force=True)
+            entry = self._files[name]
+            deck_id = f"{_ID_PREFIX}{entry['hash'][:16]}-{'w' if weighted else 'u'}"
+            table = get_deck_table(deck_id)
+            if table is not None:
+                return table
+            path = os.path.join(self.index_dir, f"{deck_id}.deck")
+            try:
+                table = read_index(path, deck_id)
+            except (FileNotFoundError, ValueError):  # not built yet, or an older format
+                source = os.path.join(self.directory, name)
+                options = _csv_options(source) if name.lower().endswith('.csv') else {}
+                with open(source, 'rb') as f:
+                    parsed = parse_deck_table(f, name, weighted, **options)
+                os.makedirs(self.index_dir, exist_ok=True)
+                write_index(parsed, path)
+                table = read_index(path, deck_id)
+        register_deck_table(table)
+        return table
+
+    def load_deck(self, deck_id: str) -> Optional[DeckTable]:
+        """Reopen a library deck by its id, or None if its file changed or was removed."""
+        if not is_library_deck(deck_id):
+            return None
+        table = get_deck_table(deck_id)
+        if table is not None:
+            return table
+        content, _, variant = deck_id[len(_ID_PREFIX):].rpartition('-')
+        for name in self.names():
+            if self._files[name]['hash'].startswith(content):
+                return self.open(name, variant == 'w')
+        return None
+
+    def _scan(self, force: bool = False):
+        """Bring the manifest up to date with the directory (lock held)."""
+        now = time.monotonic()
+        if not force and now - self._scanned < RESCAN_SECONDS:
+            return
+        self._scanned = now
+        try:
+            found = {
+                entry.name: entry.stat()
+                for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.lower().endswith(DECK_EXTENSIONS)
+            }
+        except FileNotFoundError:
+            found = {}
+
+        changed = set(self._files) - set(found)
+        outdated = [self._files.pop(name) for name in changed]
+        for name, stat in found.items():
+            entry = self._files.get(name)
+            if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                continue
+            # Touched or new: only a different hash makes the index outdated
+            content = _file_hash(os.path.join(self.directory, name))
+            if entry is not None and entry['hash'] != content:
+                outdated.append(entry)
+            self._files[name] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': content}
+            changed.add(name)
+        if changed:
+            self._save_manifest()
+            for entry in outdated:
+                self._remove_index(entry['hash'])
+
+    def _remove_index(self, content: str):
+        """Delete the index files of a content hash no deck has any more."""
+        if any(entry['hash'] == content for entry in self._files.values()):
+            return
+        for variant in 'uw':
+            try:
+                os.remove(os.path.join(self.index_dir, f"{_ID_PREFIX}{content[:16]}-{variant}.deck"))
+            except OSError:  # already gone, or still mapped (Windows)
+                pass
+
+    def _save_manifest(self):
+        """Write the manifest atomically."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        temporary = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(self._files, f, indent=1, sort_keys=True)
+        os.replace(temporary, self._manifest_path)
+
+
+_library: Optional[DeckLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_library() -> DeckLibrary:
+    """Return the process-wide library of LIBRARY_DIR."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = DeckLibrary()
+        return _library
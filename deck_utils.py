@@ -3,10 +3,34 @@ Deck management utilities for the card selector application.
 Handles parsing, weighting, and random selection.
 """
 
+import codecs
+import csv
+import hashlib
+import itertools
+import math
+import os
 import random
-from typing import Tuple, Dict, List, Optional
+import sys
+import threading
+import weakref
+from array import array
+from collections import Counter, OrderedDict
+from typing import IO, Tuple, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
 from io import StringIO
 
+from profiling import instrument
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python decks are used instead
+    np = None
+
+# The deck behind the "Use Sample" button, part of the default deck library
+SAMPLE_DECK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'decks', 'sample_deck.txt')
+
+# Unweighted decks at least this large use NumpyDeck when NumPy is available
+NUMPY_MIN_CARDS = 100_000
+
 
 def parse_card_line(line: str) -> Optional[str]:
     """
@@ -22,61 +46,544 @@ def parse_card_line(line: str) -> Optional[str]:
     if not line or line.startswith('#'):  # Skip empty lines and comments
         return None
     
-    # Weights are no longer supported, so we treat the entire line as the card name
-    # Even if it contains a pipe, we include it as part of the name
+    # Unweighted mode: the entire line is the card name, a pipe included
+    # (weighted decks are parsed by parse_weighted_card_line)
     return line
 
 
-def parse_deck_text(text: str) -> List[str]:
+def parse_weighted_card_line(line: str) -> Optional[Tuple[str, float]]:
     """
-    Parse deck text input.
+    Parse a single card line with an optional ``Name | weight`` suffix.
     
     Args:
-        text: Multi-line text with card names
+        line: A single line from the deck input
         
     Returns:
-        List of card names
+        A (name, weight) tuple, or None if the line is empty, a comment,
+        or has a non-positive weight. Lines without a numeric weight
+        after the last pipe are kept whole with a weight of 1.0.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    
+    name, pipe, weight_text = line.rpartition('|')
+    if pipe:
+        weight = _parse_weight(weight_text)
+        if weight is not None:
+            name = name.strip()
+            if not name or weight <= 0:
+                return None
+            return name, weight
+    
+    return line, 1.0
+
+
+def _parse_weight(text: str) -> Optional[float]:
+    """Parse a weight value, returning None if it is not a finite number."""
+    try:
+        weight = float(text.strip())
+    except ValueError:
+        return None
+    return weight if math.isfinite(weight) else None
+
+
+# Number of characters (or bytes) read from a deck source at a time
+CHUNK_SIZE = 1 << 16
+
+DeckSource = Union[str, IO]
+
+
+def _iter_chunks(source: DeckSource, encoding: str, chunk_size: int) -> Iterator[str]:
+    """Yield decoded text chunks from a string or a text/binary file object."""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_deck_lines(
+    source: DeckSource,
+    encoding: str = 'utf-8-sig',
+    chunk_size: int = CHUNK_SIZE,
+    keepends: bool = False
+) -> Iterator[str]:
+    """
+    Lazily split a deck source into lines.
+    
+    The source is read and decoded one chunk at a time, so only the current
+    chunk and a partial line are held in memory. CRLF, CR and LF line
+    endings are all accepted, and a leading BOM is dropped.
+    
+    Args:
+        source: Deck text, or a text or binary file object
+        encoding: Encoding used for binary file objects
+        chunk_size: Number of characters or bytes read per chunk
+        keepends: Whether to end each yielded line with ``\\n``
+        
+    Yields:
+        Lines, without their line endings unless ``keepends`` is set
+    """
+    carry = ''
+    first = True
+    for chunk in _iter_chunks(source, encoding, chunk_size):
+        if first:
+            chunk = chunk.lstrip('\ufeff')
+            first = False
+        text = carry + chunk
+        # Hold back a trailing CR in case the matching LF starts the next chunk
+        held = ''
+        if text.endswith('\r'):
+            text, held = text[:-1], '\r'
+        lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        carry = lines.pop() + held
+        if keepends:
+            lines = [line + '\n' for line in lines]
+        yield from lines
+    
+    if carry:
+        lines = carry.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        if keepends:
+            lines = [line + '\n' for line in lines]
+        yield from lines
+
+
+def iter_card_names(source: DeckSource, **kwargs) -> Iterator[str]:
     """
-    cards = []
+    Lazily parse card names from a deck source.
     
-    for line in text.split('\n'):
+    Args:
+        source: Deck text, or a text or binary file object
+        **kwargs: Passed through to iter_deck_lines
+        
+    Yields:
+        Card names
+    """
+    for line in iter_deck_lines(source, **kwargs):
         card_name = parse_card_line(line)
         if card_name:
-            cards.append(card_name)
+            yield card_name
+
+
+def iter_weighted_cards(source: DeckSource, **kwargs) -> Iterator[Tuple[str, float]]:
+    """
+    Lazily parse (name, weight) entries from a deck source.
+    
+    Args:
+        source: Deck text, or a text or binary file object
+        **kwargs: Passed through to iter_deck_lines
+        
+    Yields:
+        (name, weight) tuples
+    """
+    for line in iter_deck_lines(source, **kwargs):
+        entry = parse_weighted_card_line(line)
+        if entry:
+            yield entry
+
+
+class CardRecord(NamedTuple):
+    """A card parsed from a structured (CSV) deck file."""
+    name: str
+    weight: float = 1.0
+    category: Optional[str] = None
+
+
+# Column spec: a zero-based index, or a header name (case-insensitive)
+ColumnSpec = Union[int, str]
+
+# Header cells that mark the first CSV row as a header row
+_HEADER_NAMES = {
+    'name', 'names', 'card', 'cards', 'card name', 'card_name', 'cardname',
+    'weight', 'weights', 'category', 'categories', 'type', 'count'
+}
+
+
+def parse_column_spec(text: str) -> Optional[ColumnSpec]:
+    """
+    Parse a user-entered CSV column.
     
-    return cards
+    Args:
+        text: A one-based column number, a header name, or blank
+        
+    Returns:
+        A zero-based index, the header name, or None if blank
+    """
+    text = text.strip()
+    if not text:
+        return None
+    if text.isdigit():
+        return max(int(text) - 1, 0)
+    return text
+
 
+def _looks_like_header(row: List[str], weight_index: Optional[int]) -> bool:
+    """Guess whether the first CSV row is a header row."""
+    if any(cell.strip().lower() in _HEADER_NAMES for cell in row):
+        return True
+    if weight_index is not None and weight_index < len(row):
+        return _parse_weight(row[weight_index]) is None
+    return False
 
-def parse_deck_file(file_content: str, filename: str) -> List[str]:
+
+def _resolve_column(column: Optional[ColumnSpec], header: Optional[List[str]]) -> Optional[int]:
+    """Turn a column spec into a zero-based index."""
+    if column is None or isinstance(column, int):
+        return column
+    
+    if header is not None:
+        wanted = column.strip().lower()
+        for index, cell in enumerate(header):
+            if cell.strip().lower() == wanted:
+                return index
+    raise ValueError(f"CSV column '{column}' not found in header")
+
+
+def _open_csv(
+    source: DeckSource,
+    name_column: ColumnSpec,
+    weight_column: Optional[ColumnSpec],
+    category_column: Optional[ColumnSpec],
+    has_header: Optional[bool]
+) -> Tuple[Iterator[List[str]], int, Optional[int], Optional[int]]:
+    """Start reading CSV rows and resolve the name/weight/category columns."""
+    rows = csv.reader(iter_deck_lines(source, keepends=True), skipinitialspace=True)
+    
+    first = None
+    for row in rows:
+        if row and not row[0].startswith('#'):
+            first = row
+            break
+    if first is None:
+        return iter(()), 0, None, None
+    
+    if has_header is None:
+        named = any(isinstance(c, str) for c in (name_column, weight_column, category_column))
+        weight_guess = weight_column if isinstance(weight_column, int) else None
+        has_header = named or _looks_like_header(first, weight_guess)
+    header = first if has_header else None
+    
+    indices = (
+        _resolve_column(name_column, header),
+        _resolve_column(weight_column, header),
+        _resolve_column(category_column, header),
+    )
+    if not has_header:
+        rows = itertools.chain([first], rows)
+    return (rows,) + indices
+
+
+def iter_csv_cards(
+    source: DeckSource,
+    name_column: ColumnSpec = 0,
+    weight_column: Optional[ColumnSpec] = None,
+    category_column: Optional[ColumnSpec] = None,
+    has_header: Optional[bool] = None
+) -> Iterator[CardRecord]:
+    """
+    Lazily parse card records from CSV content.
+    
+    Rows are read with the ``csv`` module, so quoted commas and multi-line
+    fields are handled. Blank rows and rows starting with ``#`` are skipped.
+    
+    Args:
+        source: CSV text, or a text or binary file object
+        name_column: Column holding the card name
+        weight_column: Optional column holding the weight; missing or
+            non-numeric weights count as 1.0 and non-positive ones skip the row
+        category_column: Optional column holding the category
+        has_header: Whether the first row is a header, or None to detect it
+        
+    Yields:
+        CardRecord tuples
+        
+    Raises:
+        ValueError: If a named column is not present in the header
+    """
+    rows, name_index, weight_index, category_index = _open_csv(
+        source, name_column, weight_column, category_column, has_header
+    )
+    
+    for row in rows:
+        width = len(row)
+        if name_index >= width or row[0].startswith('#'):
+            continue
+        name = row[name_index].strip()
+        if not name:
+            continue
+        
+        weight = 1.0
+        if weight_index is not None and weight_index < width:
+            parsed = _parse_weight(row[weight_index])
+            if parsed is not None:
+                if parsed <= 0:
+                    continue
+                weight = parsed
+        
+        category = None
+        if category_index is not None and category_index < width:
+            category = row[category_index].strip() or None
+        
+        yield CardRecord(name, weight, category)
+
+
+def iter_csv_names(
+    source: DeckSource,
+    name_column: ColumnSpec = 0,
+    has_header: Optional[bool] = None,
+    **csv_options
+) -> Iterator[str]:
+    """
+    Lazily parse only the card names from CSV content.
+    
+    This is the fast path of iter_csv_cards for unweighted decks.
+    
+    Args:
+        source: CSV text, or a text or binary file object
+        name_column: Column holding the card name
+        has_header: Whether the first row is a header, or None to detect it
+        **csv_options: Other iter_csv_cards options, used for header detection
+        
+    Yields:
+        Card names
+    """
+    rows, name_index, _, _ = _open_csv(
+        source, name_column, csv_options.get('weight_column'),
+        csv_options.get('category_column'), has_header
+    )
+    
+    for row in rows:
+        if name_index < len(row) and not row[0].startswith('#'):
+            name = row[name_index].strip()
+            if name:
+                yield name
+
+
+def parse_deck_text(text: str) -> List[str]:
+    """
+    Parse deck text input.
+    
+    Args:
+        text: Multi-line text with card names
+        
+    Returns:
+        List of card names
+    """
+    return list(iter_card_names(text))
+
+
+def parse_deck_file(file_content: DeckSource, filename: str, **csv_options) -> List[str]:
     """
     Parse a deck file (CSV or TXT).
     
     Args:
-        file_content: String content of the file
+        file_content: String content of the file, or the file object itself
         filename: Name of the file for format detection
+        **csv_options: Column options for CSV files (see iter_csv_cards)
         
     Returns:
         List of card names
     """
-    # Normalize line endings
-    file_content = file_content.replace('\r\n', '\n').replace('\r', '\n')
-    
     if filename.lower().endswith('.csv'):
-        cards = []
-        # CSV format: assume first column is card name
-        for line in file_content.split('\n'):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            parts = line.split(',')
-            card_name = parts[0].strip().strip('"').strip("'")
-            if card_name:
-                cards.append(card_name)
-        return cards
+        # CSV format: first column is the card name unless told otherwise
+        return list(iter_csv_names(file_content, **csv_options))
     else:
         # TXT format: simple line parsing
-        return parse_deck_text(file_content)
+        return list(iter_card_names(file_content))
+
+
+class ParseCache:
+    """
+    A thread-safe LRU cache of parsed decks with a memory budget.
+    
+    The cache lives at module level, so it is shared by every session in
+    the server process. Entries are evicted least-recently-used first once
+    their estimated size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value for ``key`` (marking it recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size: int):
+        """Store ``value`` under ``key``, evicting old entries to stay within budget."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+# Parsed decks shared across sessions; the budget can be set in megabytes
+PARSE_CACHE = ParseCache(int(os.environ.get('CARD_SELECTOR_PARSE_CACHE_MB', '256')) << 20)
+
+# Loaded tables by deck id, kept for as long as a session or the cache holds them
+_DECKS = weakref.WeakValueDictionary()
+_decks_lock = threading.Lock()
+
+
+def register_deck_table(table: 'DeckTable'):
+    """Make a table built outside load_deck_table() findable by its ``deck_id``."""
+    with _decks_lock:
+        _DECKS[table.deck_id] = table
+
+
+def get_deck_table(deck_id: str) -> Optional['DeckTable']:
+    """
+    Look up a loaded deck by its id.
+    
+    Args:
+        deck_id: The table's ``deck_id`` (see load_deck_table)
+        
+    Returns:
+        The shared DeckTable, or None if no session or cache holds it anymore
+    """
+    with _decks_lock:
+        return _DECKS.get(deck_id)
+
+
+@instrument
+def content_hash(source: DeckSource) -> str:
+    """
+    Hash deck content without holding a second copy of it.
+    
+    File objects are read in chunks and rewound afterwards.
+    
+    Args:
+        source: Deck text, or a text or binary file object
+        
+    Returns:
+        Hex digest of the content
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, str):
+        for start in range(0, len(source), CHUNK_SIZE):
+            digest.update(source[start:start + CHUNK_SIZE].encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+    
+    start = source.tell()
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8', 'surrogatepass'))
+    source.seek(start)
+    return digest.hexdigest()
+
+
+@instrument
+def load_deck_table(
+    source: DeckSource,
+    filename: str = '',
+    weighted: bool = False,
+    **csv_options
+) -> 'DeckTable':
+    """
+    Parse a deck into a DeckTable, reusing an earlier table for identical content.
+    
+    Tables are keyed by a content hash plus the file format, weighting and
+    CSV options, and kept in the shared PARSE_CACHE, so every session that
+    loads the same deck shares one name table. The key also gives the table
+    its ``deck_id``, under which get_deck_table() finds it again, so callers
+    can keep the id instead of the deck content.
+    
+    Args:
+        source: Deck text, or a text or binary file object
+        filename: Name of the file for format detection (blank for text)
+        weighted: Whether to parse card weights
+        **csv_options: Column options for CSV files (see iter_csv_cards)
+        
+    Returns:
+        The shared DeckTable (do not mutate)
+        
+    Raises:
+        ValueError: If a named CSV column is not present in the header
+    """
+    is_csv = filename.lower().endswith('.csv')
+    key = (content_hash(source), is_csv, weighted, tuple(sorted(csv_options.items())))
+    deck_id = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=8).hexdigest()
+    table = PARSE_CACHE.get(key)
+    if table is not None:
+        return table
+    
+    table = parse_deck_table(source, filename, weighted, **csv_options)
+    table.deck_id = deck_id
+    
+    PARSE_CACHE.put(key, table, table.nbytes())
+    with _decks_lock:
+        _DECKS[deck_id] = table
+    return table
+
+
+def parse_deck_table(
+    source: DeckSource,
+    filename: str = '',
+    weighted: bool = False,
+    **csv_options
+) -> 'DeckTable':
+    """
+    Parse a deck into a new DeckTable, without caching it.
+    
+    Args:
+        source: Deck text, or a text or binary file object
+        filename: Name of the file for format detection (blank for text)
+        weighted: Whether to parse card weights
+        **csv_options: Column options for CSV files (see iter_csv_cards)
+        
+    Returns:
+        A new DeckTable without a ``deck_id``
+        
+    Raises:
+        ValueError: If a named CSV column is not present in the header
+    """
+    if filename.lower().endswith('.csv'):
+        if weighted:
+            csv_options.setdefault('weight_column', 1)
+        entries = iter_csv_cards(source, **csv_options)
+    elif weighted:
+        entries = iter_weighted_cards(source)
+    else:
+        entries = iter_card_names(source)
+    return DeckTable.from_entries(entries, weighted)
 
 
 def random_card_choice(cards: List[str]) -> Optional[str]:
@@ -95,23 +602,592 @@ def random_card_choice(cards: List[str]) -> Optional[str]:
     return random.choice(cards)
 
 
+class DeckTable:
+    """
+    Immutable, shareable storage for a loaded deck.
+    
+    Each distinct card name is stored once in ``names``; the deck itself is
+    ``card_ids``, a compact ``array('I')`` of indices into it (duplicates
+    repeat an index). Weighted decks add a parallel ``array('d')`` of
+    weights, and CSV categories are kept per distinct name. Tables built by
+    load_deck_table() carry a ``deck_id`` derived from their content.
+    Library decks (see deck_library) hold the same data as read-only,
+    memory-mapped sequences instead of tuples and arrays.
+    """
+
+    __slots__ = ('names', 'card_ids', 'weights', 'categories', 'deck_id', '__weakref__')
+
+    def __init__(
+        self,
+        names: Tuple[str, ...],
+        card_ids: array,
+        weights: Optional[array] = None,
+        categories: Optional[Tuple[Optional[str], ...]] = None,
+        deck_id: str = ''
+    ):
+        self.names = names
+        self.card_ids = card_ids
+        self.weights = weights
+        self.categories = categories
+        self.deck_id = deck_id
+
+    @classmethod
+    def from_entries(cls, entries: Iterable, weighted: bool = False) -> 'DeckTable':
+        """
+        Build a table from parsed entries.
+        
+        Args:
+            entries: Card names, (name, weight) tuples or CardRecords
+            weighted: Whether to keep entry weights
+            
+        Returns:
+            A new DeckTable
+        """
+        index_of = {}
+        card_ids = array('I')
+        weights = array('d') if weighted else None
+        categories = {}
+        
+        for entry in entries:
+            if isinstance(entry, str):
+                name, weight, category = entry, 1.0, None
+            elif isinstance(entry, CardRecord):
+                name, weight, category = entry
+            else:
+                (name, weight), category = entry, None
+            
+            card_id = index_of.get(name)
+            if card_id is None:
+                card_id = index_of[name] = len(index_of)
+            card_ids.append(card_id)
+            if weights is not None:
+                weights.append(weight)
+            if category and card_id not in categories:
+                categories[card_id] = category
+        
+        names = tuple(index_of)
+        category_table = None
+        if categories:
+            category_table = tuple(categories.get(i) for i in range(len(names)))
+        return cls(names, card_ids, weights, category_table)
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    def name(self, card_id: int) -> str:
+        """Return the name of a card id."""
+        return self.names[card_id]
+
+    def category(self, card_id: int) -> Optional[str]:
+        """Return the category of a card id, if any."""
+        return self.categories[card_id] if self.categories else None
+
+    def head(self, count: int) -> List[str]:
+        """Return the names of the first ``count`` cards, in deck order."""
+        return [self.names[card_id] for card_id in self.card_ids[:count]]
+
+    def nbytes(self) -> int:
+        """Roughly estimate the memory held by the table."""
+        size = sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        size += self.card_ids.itemsize * len(self.card_ids)
+        if self.weights is not None:
+            size += self.weights.itemsize * len(self.weights)
+        if self.categories is not None:
+            size += sys.getsizeof(self.categories)
+        return size
+
+
+def _as_table(cards: Union[DeckTable, Iterable], weighted: bool = False) -> DeckTable:
+    """Accept either a DeckTable or raw entries."""
+    return cards if isinstance(cards, DeckTable) else DeckTable.from_entries(cards, weighted)
+
+
+class Deck:
+    """
+    A pool of cards supporting constant-time random draws.
+
+    The pool is an ``array('I')`` of card ids into a shared DeckTable. Cards
+    are drawn by index: the chosen slot is swapped with the last one and
+    popped, so a draw never scans or shifts the array. Duplicate card names
+    are separate entries and are drawn independently.
+    """
+
+    def __init__(self, cards: Union[DeckTable, Iterable[str]] = (), rng=None):
+        """
+        Create a deck.
+
+        Args:
+            cards: A DeckTable, or card names making up the full deck
+            rng: Random source with a ``randrange`` method (defaults to
+                the ``random`` module)
+        """
+        self.table = _as_table(cards)
+        self._cards = array('I', self.table.card_ids)
+        self._rng = rng if rng is not None else random
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    @property
+    def total(self) -> int:
+        """Number of cards in the full deck."""
+        return len(self.table)
+
+    def draw_id(self) -> Optional[int]:
+        """
+        Remove a random card and return its card id.
+
+        Returns:
+            The drawn card id, or None if the deck is empty
+        """
+        cards = self._cards
+        if not cards:
+            return None
+
+        index = self._rng.randrange(len(cards))
+        cards[index], cards[-1] = cards[-1], cards[index]
+        return cards.pop()
+
+    def draw_many_ids(self, count: int) -> array:
+        """
+        Remove ``count`` random cards in one pass (a partial Fisher-Yates shuffle).
+
+        The result matches ``count`` successive draw_id() calls.
+
+        Args:
+            count: Number of cards to draw (capped at the cards left)
+
+        Returns:
+            array('I') of drawn card ids, in draw order
+        """
+        cards = self._cards
+        size = len(cards)
+        count = max(0, min(count, size))
+        randrange = self._rng.randrange
+        for last in range(size - 1, size - 1 - count, -1):
+            index = randrange(last + 1)
+            cards[index], cards[last] = cards[last], cards[index]
+        drawn = cards[size - count:]
+        del cards[size - count:]
+        drawn.reverse()
+        return drawn
+
+    def draw(self) -> Optional[str]:
+        """
+        Remove and return a random card.
+
+        Returns:
+            The drawn card name, or None if the deck is empty
+        """
+        card_id = self.draw_id()
+        return None if card_id is None else self.table.names[card_id]
+
+    def reset(self):
+        """Return every card of the full deck to the pool."""
+        # Draws are uniform over the pool, so no shuffle is needed here
+        self._cards = array('I', self.table.card_ids)
+
+    def put_back(self, card_id: int):
+        """Return a drawn card to the pool (used to undo a draw)."""
+        self._cards.append(card_id)
+
+    def remove_ids(self, card_ids: array):
+        """
+        Take specific cards out of the pool, as if drawn in that order (used
+        to undo a reset from the cards it returned).
+
+        Raises:
+            ValueError: If some of the cards are not in the pool
+        """
+        cards = self._cards
+        held = Counter(card_ids)
+        pool = array('I', itertools.filterfalse(held.__contains__, cards))
+        if len(pool) + len(card_ids) != len(cards):
+            # Copies of a card beyond the ones taken out stay in the pool
+            for card_id, count in Counter(filter(held.__contains__, cards)).items():
+                pool.extend(array('I', [card_id]) * (count - held[card_id]))
+        if len(pool) + len(card_ids) != len(cards):
+            raise ValueError("some of the cards are not in the pool")
+        self._cards = pool
+
+    def snapshot(self) -> array:
+        """Return a copy of the pool state for restore()."""
+        return array('I', self._cards)
+
+    def restore(self, state: array):
+        """Restore a pool state taken with snapshot()."""
+        self._cards = array('I', state)
+
+
+class WeightedDeck:
+    """
+    A pool of weighted cards drawn with a Walker/Vose alias table.
+
+    Each draw is O(1) expected: a slot is picked uniformly, then either the
+    slot's own card or its alias. Drawn cards are only marked as removed and
+    rejected if picked again; the table is rebuilt from the remaining cards
+    once they hold less than half of the weight it was built with, which
+    keeps the expected number of attempts per draw below two.
+    """
+
+    def __init__(self, cards: Union[DeckTable, Iterable[Tuple[str, float]]] = (), rng=None):
+        """
+        Create a weighted deck.
+
+        Args:
+            cards: A weighted DeckTable, or (name, weight) tuples with
+                positive weights
+            rng: Random source with ``randrange`` and ``random`` methods
+                (defaults to the ``random`` module)
+        """
+        self.table = _as_table(cards, weighted=True)
+        if self.table.weights is None:
+            self._weights = array('d', [1.0]) * len(self.table)
+        else:
+            self._weights = self.table.weights
+        self._rng = rng if rng is not None else random
+        self.reset()
+
+    def __len__(self) -> int:
+        return self._remaining
+
+    @property
+    def total(self) -> int:
+        """Number of cards in the full deck."""
+        return len(self.table)
+
+    def draw_id(self) -> Optional[int]:
+        """
+        Remove a card chosen proportionally to its weight and return its card id.
+
+        Returns:
+            The drawn card id, or None if the deck is empty
+        """
+        if not self._remaining:
+            return None
+
+        if self._stale or self._live_weight < self._table_weight / 2:
+            self._build_table()
+
+        rng = self._rng
+        slots, prob, alias, alive = self._slots, self._prob, self._alias, self._alive
+        while True:
+            slot = rng.randrange(len(slots))
+            index = slots[slot] if rng.random() < prob[slot] else alias[slot]
+            if alive[index]:
+                break
+
+        alive[index] = 0
+        self._drawn.append(index)
+        self._remaining -= 1
+        self._live_weight -= self._weights[index]
+        return self.table.card_ids[index]
+
+    def draw_many_ids(self, count: int) -> array:
+        """
+        Remove ``count`` cards, each chosen proportionally to its weight.
+
+        Args:
+            count: Number of cards to draw (capped at the cards left)
+
+        Returns:
+            array('I') of drawn card ids, in draw order
+        """
+        draw_id = self.draw_id
+        return array('I', [draw_id() for _ in range(max(0, min(count, self._remaining)))])
+
+    def draw(self) -> Optional[str]:
+        """
+        Remove and return a card chosen proportionally to its weight.
+
+        Returns:
+            The drawn card name, or None if the deck is empty
+        """
+        card_id = self.draw_id()
+        return None if card_id is None else self.table.names[card_id]
+
+    def reset(self):
+        """Return every card of the full deck to the pool."""
+        self._alive = bytearray(b'\x01') * len(self.table)
+        self._drawn = array('I')
+        self._remaining = len(self.table)
+        self._build_table()
+
+    def put_back(self, card_id: int):
+        """
+        Return the most recently drawn card to the pool (used to undo a draw).
+
+        Raises:
+            ValueError: If ``card_id`` is not the most recently drawn card
+        """
+        if not self._drawn or self.table.card_ids[self._drawn[-1]] != card_id:
+            raise ValueError("only the most recently drawn card can be put back")
+        index = self._drawn.pop()
+        self._alive[index] = 1
+        self._remaining += 1
+        if self._in_table[index]:
+            self._live_weight += self._weights[index]
+        else:
+            # Not covered by the current alias table; rebuild on next draw
+            self._stale = True
+
+    def remove_ids(self, card_ids: array):
+        """
+        Take specific cards out of the pool, as if drawn in that order (used
+        to undo a reset from the cards it returned).
+
+        Where a card has several copies, the first ones still in the pool
+        are taken.
+
+        Raises:
+            ValueError: If some of the cards are not in the pool
+        """
+        held = Counter(card_ids)
+        ids, alive = self.table.card_ids, self._alive
+        copies: Dict[int, List[int]] = {}
+        for index in itertools.compress(range(len(ids)), map(held.__contains__, ids)):
+            if alive[index]:
+                copies.setdefault(ids[index], []).append(index)
+        if any(len(copies.get(card_id, ())) < count for card_id, count in held.items()):
+            raise ValueError("some of the cards are not in the pool")
+        for indexes in copies.values():
+            indexes.reverse()
+
+        for card_id in card_ids:
+            index = copies[card_id].pop()
+            alive[index] = 0
+            self._drawn.append(index)
+            self._remaining -= 1
+            if self._in_table[index]:
+                self._live_weight -= self._weights[index]
+
+    def snapshot(self) -> Tuple:
+        """
+        Return a copy of the pool state for restore().
+
+        The alias table is included (it is never modified in place, so it
+        is shared rather than copied): a restored deck continues with the
+        same draws for the same random numbers.
+        """
+        table = (self._in_table, self._stale, self._slots, self._prob, self._alias,
+                 self._table_weight, self._live_weight)
+        return bytes(self._alive), array('I', self._drawn), table
+
+    def restore(self, state: Tuple):
+        """Restore a pool state taken with snapshot()."""
+        alive, drawn, table = state
+        self._alive = bytearray(alive)
+        self._drawn = array('I', drawn)
+        self._remaining = len(self._alive) - len(self._drawn)
+        (self._in_table, self._stale, self._slots, self._prob, self._alias,
+         self._table_weight, self._live_weight) = table
+
+    def _build_table(self):
+        """Build the alias table over the cards still in the pool."""
+        weights = self._weights
+        slots = array('I', (i for i, live in enumerate(self._alive) if live))
+        total = math.fsum(weights[i] for i in slots)
+        count = len(slots)
+
+        prob = array('d', [1.0]) * count
+        alias = array('I', slots)
+        scaled = [weights[i] * count / total for i in slots] if total else []
+        small = [k for k, p in enumerate(scaled) if p < 1.0]
+        large = [k for k, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = slots[l]
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        self._in_table = bytearray(self._alive)
+        self._stale = False
+        self._slots = slots
+        self._prob = prob
+        self._alias = alias
+        self._table_weight = total
+        self._live_weight = total
+
+
+class NumpyDeck:
+    """
+    A pool of cards held in a NumPy array, for bulk draws from large decks.
+
+    The pool is shuffled lazily, like Deck: reset only copies the card ids
+    back, a single draw swaps a random slot with the last one and pops it,
+    and a batch draw picks all its slots at once with ``Generator.choice``
+    and moves the drawn cards to the end of the pool, so it costs O(count)
+    vectorized work whatever the deck size. Requires NumPy.
+    """
+
+    def __init__(self, cards: Union[DeckTable, Iterable[str]] = (), rng=None):
+        """
+        Create a deck.
+
+        Args:
+            cards: A DeckTable, or card names making up the full deck
+            rng: Random source for single draws, also used to seed the
+                NumPy generator for batch draws (defaults to the ``random``
+                module)
+        """
+        if np is None:
+            raise RuntimeError("NumpyDeck requires NumPy")
+        self.table = _as_table(cards)
+        self._card_ids = np.frombuffer(self.table.card_ids, dtype=np.uint32)
+        self._rng = rng if rng is not None else random
+        self.generator = np.random.default_rng(self._rng.getrandbits(64))
+        self.reset()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def total(self) -> int:
+        """Number of cards in the full deck."""
+        return len(self.table)
+
+    def draw_id(self) -> Optional[int]:
+        """
+        Remove a random card and return its card id.
+
+        Returns:
+            The drawn card id, or None if the deck is empty
+        """
+        if not self._size:
+            return None
+        # Through the memoryview: plain ints, without NumPy's per-item overhead
+        slots = self._slots
+        index = self._rng.randrange(self._size)
+        self._size -= 1
+        last = self._size
+        card_id = slots[index]
+        slots[index] = slots[last]
+        slots[last] = card_id
+        return card_id
+
+    def draw_many_ids(self, count: int) -> array:
+        """
+        Remove ``count`` random cards in one vectorized step.
+
+        The drawn cards take the place of the last ``count`` slots of the
+        pool, whose undrawn cards fill the slots left by the drawn ones.
+
+        Args:
+            count: Number of cards to draw (capped at the cards left)
+
+        Returns:
+            array('I') of drawn card ids, in draw order
+        """
+        size = self._size
+        count = max(0, min(count, size))
+        drawn = array('I')
+        if not count:
+            return drawn
+        order = self._order
+        start = size - count
+        slots = self.generator.choice(size, count, replace=False)
+        picked = order[slots]
+        in_tail = np.zeros(count, dtype=bool)
+        in_tail[slots[slots >= start] - start] = True
+        order[slots[slots < start]] = order[start:size][~in_tail]
+        order[start:size] = picked[::-1]
+        self._size = start
+        drawn.frombytes(picked.tobytes())
+        return drawn
+
+    def draw(self) -> Optional[str]:
+        """
+        Remove and return a random card.
+
+        Returns:
+            The drawn card name, or None if the deck is empty
+        """
+        card_id = self.draw_id()
+        return None if card_id is None else self.table.names[card_id]
+
+    def reset(self):
+        """Return every card of the full deck to the pool."""
+        # Draws are uniform over the pool, so no shuffle is needed here
+        self._set_order(self._card_ids.copy(), len(self._card_ids))
+
+    def put_back(self, card_id: int):
+        """
+        Return the most recently drawn card to the pool (used to undo a draw).
+
+        Raises:
+            ValueError: If ``card_id`` is not the most recently drawn card
+        """
+        if self._size >= len(self._order) or self._order[self._size] != card_id:
+            raise ValueError("only the most recently drawn card can be put back")
+        self._size += 1
+
+    def remove_ids(self, card_ids: array):
+        """
+        Take specific cards out of the pool, as if drawn in that order (used
+        to undo a reset from the cards it returned).
+
+        Raises:
+            ValueError: If some of the cards are not in the pool
+        """
+        held = np.frombuffer(card_ids, dtype=np.uint32)
+        pool = self._order[:self._size]
+        # Drop the first n copies of each card held n times
+        positions = np.flatnonzero(np.isin(pool, held))
+        by_card = np.argsort(pool[positions], kind='stable')
+        found = pool[positions][by_card]
+        rank = np.arange(len(found)) - np.searchsorted(found, found)
+        counts = np.bincount(held, minlength=len(self.table.names))
+        drop = positions[by_card[rank < counts[found]]]
+        if len(drop) != len(held):
+            raise ValueError("some of the cards are not in the pool")
+        keep = np.ones(len(pool), dtype=bool)
+        keep[drop] = False
+        remaining = pool[keep]
+        self._set_order(np.concatenate((remaining, held[::-1], self._order[self._size:])), len(remaining))
+
+    def snapshot(self) -> Tuple:
+        """Return a copy of the pool state for restore()."""
+        return self._order.copy(), self._size
+
+    def restore(self, state: Tuple):
+        """Restore a pool state taken with snapshot()."""
+        order, size = state
+        self._set_order(order.copy(), size)
+
+    def _set_order(self, order, size: int):
+        """Replace the pool array (the first ``size`` entries are in the pool)."""
+        self._order = order
+        self._slots = memoryview(order)
+        self._size = size
+
+
+def make_deck(table: DeckTable, weighted: bool = False, rng=None, backend: str = 'auto'):
+    """
+    Create the deck implementation best suited to a table.
+
+    Args:
+        table: The deck to draw from
+        weighted: Whether to draw proportionally to card weights
+        rng: Random source passed to the deck
+        backend: 'python', 'numpy', or 'auto' to use NumPy for unweighted
+            decks of at least NUMPY_MIN_CARDS cards when it is installed
+
+    Returns:
+        A Deck, WeightedDeck or NumpyDeck
+    """
+    if weighted:
+        return WeightedDeck(table, rng)
+    if backend == 'numpy' or (backend == 'auto' and np is not None and len(table) >= NUMPY_MIN_CARDS):
+        return NumpyDeck(table, rng)
+    return Deck(table, rng)
+
+
 def get_sample_deck() -> str:
-    """Return a sample deck for demonstration."""
-    return """# Fantasy Card Deck
-# Enter one card name per line
-
-Goblin Scout
-Forest Sprite
-Stone Golem
-River Serpent
-Shadow Assassin
-Fire Elemental
-Ice Mage
-Thunder Knight
-Dragon Rider
-Phoenix Lord
-Crystal Guardian
-Void Walker
-Ancient Dragon
-God of Thunder
-"""
+    """Return the sample deck (decks/sample_deck.txt) for demonstration."""
+    with open(SAMPLE_DECK_PATH, encoding='utf-8') as f:
+        return f.read()
@@ -0,0 +1,401 @@
+"""
+Durable game storage for the card selector application.
+Keeps every game as an append-only event log in SQLite, with periodic
+state snapshots, so a game survives browser refreshes and server restarts.
+"""
+
+import json
+import os
+import pickle
+import secrets
+import sqlite3
+import threading
+import weakref
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from deck_engine import DeckSession
+from deck_library import get_library, is_library_deck
+from deck_utils import DeckTable, get_deck_table, register_deck_table
+
+# Database file; set CARD_SELECTOR_DB to an empty string to turn persistence off
+DB_PATH = os.environ.get(
+    'CARD_SELECTOR_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'games.db')
+)
+
+# Events between two state snapshots of a game. A snapshot costs O(deck
+# size), so large decks snapshot less often: at least every SNAPSHOT_EVERY
+# events, and no more than once per SNAPSHOT_CARDS_PER_EVENT cards of deck
+SNAPSHOT_EVERY = int(os.environ.get('CARD_SELECTOR_SNAPSHOT_EVERY', '500'))
+SNAPSHOT_CARDS_PER_EVENT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    deck_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    game_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    args TEXT NOT NULL,
+    PRIMARY KEY (game_id, seq)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    game_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    deck_id TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (game_id, seq)
+);
+CREATE TABLE IF NOT EXISTS shelf_decks (
+    shelf_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    game_id TEXT NOT NULL,
+    remaining INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (shelf_id, position)
+);
+CREATE INDEX IF NOT EXISTS shelf_decks_game ON shelf_decks (game_id);
+"""
+
+# A named deck of a shelf: (name, game id, cards left, total cards)
+ShelfEntry = Tuple[str, str, int, int]
+
+
+class GameInUse(Exception):
+    """A session was attached to a game that another live session is already playing."""
+
+    def __init__(self, game_id: str):
+        super().__init__(f"game {game_id} is already being played by another session")
+        self.game_id = game_id
+
+
+def _encode_table(table: DeckTable) -> bytes:
+    """Serialize a table's contents for the decks table."""
+    return zlib.compress(pickle.dumps((
+        table.names,
+        table.card_ids.tobytes(),
+        table.weights.tobytes() if table.weights is not None else None,
+        table.categories,
+    ), protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def _decode_table(deck_id: str, data: bytes) -> DeckTable:
+    """Rebuild a table serialized with _encode_table()."""
+    names, card_ids, weights, categories = pickle.loads(zlib.decompress(data))
+    ids = array('I')
+    ids.frombytes(card_ids)
+    weight_array = None
+    if weights is not None:
+        weight_array = array('d')
+        weight_array.frombytes(weights)
+    return DeckTable(names, ids, weight_array, categories, deck_id)
+
+
+class GameStore:
+    """
+    SQLite-backed event log of games.
+
+    Each state-changing DeckSession operation is appended as one small
+    event row (an O(1) write, whatever the deck size); the deck itself is
+    stored once per distinct deck. Every ``snapshot_every`` events (more for
+    large decks) the full session state is snapshotted, so loading a game
+    restores the latest snapshot and replays only the events after it.
+
+    The store is shared by all sessions of the server process and is
+    thread-safe. Each game has at most one live session per store, so its
+    log is written by a single writer: open_game() hands every caller (e.g.
+    every tab showing the same game) that session, whose operations are
+    atomic (see DeckSession), and attach() refuses a second session for a
+    game. A game's live session is forgotten once nothing refers to it, and
+    the next open_game() rebuilds it from the log.
+    """
+
+    def __init__(self, path: str, snapshot_every: int = SNAPSHOT_EVERY):
+        """
+        Open (or create) a store.
+
+        Args:
+            path: SQLite database file
+            snapshot_every: Events between two state snapshots of a game
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._seq: Dict[str, int] = {}
+        self._snapshot_seq: Dict[str, int] = {}
+        # Live session of each game, and a lock making open_game() atomic
+        self._live: 'weakref.WeakValueDictionary[str, DeckSession]' = weakref.WeakValueDictionary()
+        self._open_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+    def create_game(self) -> str:
+        """Return a new, unused game id."""
+        return secrets.token_urlsafe(9)
+
+    def open_game(self, game_id: str, create: bool = False, **session_options) -> Optional[DeckSession]:
+        """
+        Return the live session of a game, loading and attaching it if it has none.
+
+        Args:
+            game_id: Id of the game
+            create: Start a game that has no events as a new, empty session
+            **session_options: Passed to DeckSession (e.g. undo_limit)
+
+        Returns:
+            The game's attached session, or None if it has none and cannot
+            be loaded (or has no events and ``create`` is False)
+        """
+        session = self._live.get(game_id)
+        if session is not None:
+            return session
+        with self._open_lock:
+            session = self._live.get(game_id)
+            if session is not None:
+                return session
+            session = self.load_game(game_id, **session_options)
+            if session is None:
+                if not create or self._has_events(game_id):
+                    return None
+                session = DeckSession(**session_options)
+            self.attach(session, game_id)
+            return session
+
+    def attach(self, session: DeckSession, game_id: str):
+        """
+        Record every later operation of ``session`` under ``game_id``.
+
+        Raises:
+            GameInUse: If another live session is attached to the game
+        """
+        with self._lock:
+            live = self._live.get(game_id)
+            if live is not None and live is not session:
+                raise GameInUse(game_id)
+            self._live[game_id] = session
+            if game_id not in self._seq:
+                row = self._db.execute(
+                    'SELECT MAX(seq) FROM events WHERE game_id = ?', (game_id,)
+                ).fetchone()
+                self._seq[game_id] = row[0] if row[0] is not None else 0
+                row = self._db.execute(
+                    'SELECT MAX(seq) FROM snapshots WHERE game_id = ?', (game_id,)
+                ).fetchone()
+                self._snapshot_seq[game_id] = row[0] if row[0] is not None else 0
+        session.journal = lambda session, op, args: self._record(game_id, session, op, args)
+
+    def save_deck(self, table: DeckTable) -> str:
+        """
+        Store a deck's contents once, under its ``deck_id``.
+
+        Library decks are not copied: the deck library reopens them by id.
+
+        Returns:
+            The deck id
+        """
+        if not table.deck_id:
+            raise ValueError("only decks loaded through load_deck_table() can be stored")
+        if is_library_deck(table.deck_id):
+            return table.deck_id
+        with self._lock:
+            exists = self._db.execute(
+                'SELECT 1 FROM decks WHERE deck_id = ?', (table.deck_id,)
+            ).fetchone()
+        if not exists:
+            data = _encode_table(table)
+            with self._lock:
+                self._db.execute(
+                    'INSERT OR IGNORE INTO decks (deck_id, data) VALUES (?, ?)',
+                    (table.deck_id, data)
+                )
+        return table.deck_id
+
+    def _record(self, game_id: str, session: DeckSession, op: str, args: tuple):
+        """Journal callback: append one event, snapshotting periodically."""
+        if op == 'load':
+            args = (self.save_deck(session.table),) + args
+        with self._lock:
+            seq = self._seq[game_id] = self._seq[game_id] + 1
+            self._db.execute(
+                'INSERT INTO events (game_id, seq, op, args) VALUES (?, ?, ?, ?)',
+                (game_id, seq, op, json.dumps(args))
+            )
+        interval = max(self.snapshot_every, session.total // SNAPSHOT_CARDS_PER_EVENT)
+        if seq - self._snapshot_seq[game_id] >= interval:
+            self.snapshot(game_id, session, seq)
+
+    def snapshot(self, game_id: str, session: DeckSession, seq: Optional[int] = None):
+        """Store the session's full state as of event ``seq`` (default: the latest)."""
+        state = zlib.compress(pickle.dumps(session.export_state(), protocol=pickle.HIGHEST_PROTOCOL), 1)
+        with self._lock:
+            if seq is None:
+                seq = self._seq.get(game_id, 0)
+            self._snapshot_seq[game_id] = seq
+            self._db.execute(
+                'INSERT OR REPLACE INTO snapshots (game_id, seq, deck_id, state) VALUES (?, ?, ?, ?)',
+                (game_id, seq, session.table.deck_id, state)
+            )
+            # Older snapshots are no longer needed to rebuild the game
+            self._db.execute('DELETE FROM snapshots WHERE game_id = ? AND seq < ?', (game_id, seq))
+
+    def save_shelf(self, shelf_id: str, entries: List[ShelfEntry]):
+        """
+        Store the named decks of a shelf (see deck_engine.DeckShelf), replacing
+        its previous list.
+
+        Args:
+            shelf_id: Caller-defined shelf id (e.g. its first deck's game id)
+            entries: The shelf's decks, in order
+        """
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.execute('DELETE FROM shelf_decks WHERE shelf_id = ?', (shelf_id,))
+                self._db.executemany(
+                    'INSERT INTO shelf_decks (shelf_id, position, name, game_id, remaining, total) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [(shelf_id, position) + tuple(entry) for position, entry in enumerate(entries)]
+                )
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def load_shelf(self, game_id: str) -> Optional[Tuple[str, List[ShelfEntry]]]:
+        """
+        Find the shelf one of whose decks is the game ``game_id``.
+
+        Returns:
+            (shelf id, its decks in order), or None if no stored shelf has
+            that game
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT shelf_id FROM shelf_decks WHERE game_id = ? LIMIT 1', (game_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            entries = self._db.execute(
+                'SELECT name, game_id, remaining, total FROM shelf_decks WHERE shelf_id = ? ORDER BY position',
+                (row[0],)
+            ).fetchall()
+        return row[0], entries
+
+    def load_deck(self, deck_id: str) -> Optional[DeckTable]:
+        """Return a stored (or library) deck, reusing the in-memory table if one is loaded."""
+        table = get_deck_table(deck_id)
+        if table is not None:
+            return table
+        if is_library_deck(deck_id):
+            return get_library().load_deck(deck_id)
+        with self._lock:
+            row = self._db.execute('SELECT data FROM decks WHERE deck_id = ?', (deck_id,)).fetchone()
+        if row is None:
+            return None
+        table = _decode_table(deck_id, row[0])
+        register_deck_table(table)
+        return table
+
+    def load_game(self, game_id: str, **session_options) -> Optional[DeckSession]:
+        """
+        Rebuild a game from its latest snapshot and the events after it.
+
+        Args:
+            game_id: Id of the game
+            **session_options: Passed to DeckSession (e.g. undo_limit)
+
+        Returns:
+            A new restored session (not attached; see open_game() for the
+            game's live one), or None if the game has no events
+        """
+        with self._lock:
+            snapshot = self._db.execute(
+                'SELECT seq, deck_id, state FROM snapshots WHERE game_id = ? ORDER BY seq DESC LIMIT 1',
+                (game_id,)
+            ).fetchone()
+            since = snapshot[0] if snapshot is not None else 0
+            events = self._db.execute(
+                'SELECT op, args FROM events WHERE game_id = ? AND seq > ? ORDER BY seq',
+                (game_id, since)
+            ).fetchall()
+        if snapshot is None and not events:
+            return None
+
+        session = DeckSession(**session_options)
+        if snapshot is not None:
+            table = self.load_deck(snapshot[1])
+            if table is None:
+                return None
+            session.restore_state(table, pickle.loads(zlib.decompress(snapshot[2])))
+        for op, args in events:
+            if not self._replay(session, op, json.loads(args)):
+                return None
+        return session
+
+    def _has_events(self, game_id: str) -> bool:
+        """Whether a game has any logged event."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT 1 FROM events WHERE game_id = ? LIMIT 1', (game_id,)
+            ).fetchone() is not None
+
+    def _replay(self, session: DeckSession, op: str, args: list) -> bool:
+        """Apply one logged event to a session; False if it cannot be replayed."""
+        if op == 'load':
+            deck_id, weighted, seed = args
+            table = self.load_deck(deck_id)
+            if table is None:
+                return False
+            session.seed = seed
+            session.load(table, weighted)
+        elif op == 'reseed':
+            session.reseed(args[0])
+        elif op == 'draw':
+            session.draw()
+        elif op == 'draw_many':
+            session.draw_many(args[0])
+        elif op == 'discard':
+            session.discard()
+        elif op == 'reset':
+            session.reset()
+        elif op == 'undo':
+            session.undo()
+        else:
+            return False
+        return True
+
+
+_store: Optional[GameStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[GameStore]:
+    """Return the process-wide store at DB_PATH, or None if persistence is off."""
+    global _store
+    if not DB_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = GameStore(DB_PATH)
+        return _store
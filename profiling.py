@@ -0,0 +1,242 @@
+"""
+Rerun instrumentation for the card selector application.
+Times the phases of each script run, logs them as structured records and
+can capture a cProfile profile of a run on demand.
+
+Instrumentation is off unless ``CARD_SELECTOR_PROFILE`` is set. When off,
+``instrument`` leaves functions undecorated and ``timed`` returns a shared
+no-op context manager, so the hooks cost a flag check at most.
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+ENABLED = os.environ.get('CARD_SELECTOR_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+# Where on-demand cProfile profiles are written
+PROFILE_DIR = os.environ.get(
+    'CARD_SELECTOR_PROFILE_DIR',
+    os.path.join(tempfile.gettempdir(), 'card_selector_profiles')
+)
+
+# Finished runs, newest last, shared by every session in the process
+RECENT_RUNS = deque(maxlen=100)
+
+logger = logging.getLogger('card_selector.profile')
+
+_NULL_TIMER = nullcontext()
+_local = threading.local()
+_profile_requested = threading.Event()
+
+
+class RunRecord:
+    """Timings of one script or fragment run."""
+
+    __slots__ = ('label', 'started', 'timers', 'seconds', 'profile', '_profiler')
+
+    def __init__(self, label: str, profile: bool = False):
+        self.label = label
+        self.started = time.perf_counter()
+        self.timers: Dict[str, List[float]] = {}  # name -> [calls, seconds]
+        self.seconds = 0.0
+        self.profile: Optional[str] = None
+        self._profiler = cProfile.Profile() if profile else None
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    def add(self, name: str, seconds: float):
+        """Add one timed call of ``name``."""
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+
+    def finish(self):
+        """Stop the run's clock and write its profile, if one was taken."""
+        self.seconds = time.perf_counter() - self.started
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            self.profile = os.path.join(PROFILE_DIR, f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}-{id(self):x}.prof")
+            self._profiler.dump_stats(self.profile)
+            self._profiler = None
+
+    def as_dict(self) -> dict:
+        """The run as a JSON-serializable dict (times in milliseconds)."""
+        return {
+            'event': 'rerun',
+            'run': self.label,
+            'total_ms': round(self.seconds * 1e3, 3),
+            'timers': {
+                name: {'calls': calls, 'ms': round(seconds * 1e3, 3)}
+                for name, (calls, seconds) in self.timers.items()
+            },
+            'profile': self.profile,
+        }
+
+
+class _Timer:
+    """Context manager adding its elapsed time to the thread's current run."""
+
+    __slots__ = ('name', 'record', 'owns_run', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.record = getattr(_local, 'run', None)
+        self.owns_run = self.record is None
+        if self.owns_run:
+            # No run in progress (e.g. a fragment rerun): this timer is one
+            self.record = start_run(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record.add(self.name, time.perf_counter() - self.start)
+        if self.owns_run:
+            finish_run()
+        return False
+
+
+def start_run(label: str = 'script') -> Optional[RunRecord]:
+    """
+    Start recording a run on this thread.
+
+    Any run left unfinished on the thread (a run interrupted by
+    ``st.rerun()`` or ``st.stop()``) is discarded.
+
+    Args:
+        label: Name of the run in logs and the debug panel
+
+    Returns:
+        The new record, or None when instrumentation is off
+    """
+    if not ENABLED:
+        return None
+    profile = _profile_requested.is_set()
+    if profile:
+        _profile_requested.clear()
+    _local.run = RunRecord(label, profile)
+    return _local.run
+
+
+def finish_run() -> Optional[RunRecord]:
+    """
+    Finish the thread's current run, log it and keep it in RECENT_RUNS.
+
+    Returns:
+        The finished record, or None if no run was in progress
+    """
+    if not ENABLED:
+        return None
+    record = getattr(_local, 'run', None)
+    if record is None:
+        return None
+    _local.run = None
+    record.finish()
+    RECENT_RUNS.append(record)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record.as_dict()))
+    return record
+
+
+def timed(name: str):
+    """
+    Time a block as part of the current run.
+
+    Usage::
+
+        with timed('sidebar'):
+            ...
+
+    Outside of a run the block becomes a run of its own.
+    """
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def instrument(func=None, *, name: Optional[str] = None, run: bool = False):
+    """
+    Decorator timing every call of a function as part of the current run.
+
+    When instrumentation is off the function is returned unchanged.
+
+    Args:
+        func: The function to wrap
+        name: Timer name (defaults to the function's name)
+        run: Record calls made outside of a run as runs of their own (for
+            fragments, which rerun without the rest of the script)
+    """
+    if func is None:
+        return functools.partial(instrument, name=name, run=run)
+    if not ENABLED:
+        return func
+
+    timer_name = name or func.__name__
+    if run:
+        @functools.wraps(func)
+        def run_wrapper(*args, **kwargs):
+            with _Timer(timer_name):
+                return func(*args, **kwargs)
+        return run_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        record = getattr(_local, 'run', None)
+        if record is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record.add(timer_name, time.perf_counter() - start)
+    return wrapper
+
+
+def request_profile():
+    """Take a cProfile profile of the next run started in this process."""
+    _profile_requested.set()
+
+
+def summarize(runs) -> List[dict]:
+    """
+    Aggregate timers over several runs.
+
+    Returns:
+        One row per timer with its call count and total, mean and max time
+        per run in milliseconds, slowest total first
+    """
+    totals: Dict[str, List[float]] = {}
+    for record in runs:
+        for timer_name, (calls, seconds) in record.timers.items():
+            row = totals.setdefault(timer_name, [0, 0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += calls
+            row[2] += seconds
+            row[3] = max(row[3], seconds)
+    rows = [
+        {
+            'timer': timer_name,
+            'runs': runs_seen,
+            'calls': calls,
+            'total ms': round(seconds * 1e3, 2),
+            'mean ms': round(seconds * 1e3 / runs_seen, 3),
+            'max ms': round(slowest * 1e3, 3),
+        }
+        for timer_name, (runs_seen, calls, seconds, slowest) in totals.items()
+    ]
+    rows.sort(key=lambda row: row['total ms'], reverse=True)
+    return rows
@@ -0,0 +1,105 @@
+"""
+Shared rooms for the card selector application.
+A room is one authoritative DeckSession, kept in the server process and
+watched by any number of sessions: a host who plays, and spectators who
+follow along without holding a copy of the deck.
+"""
+
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+
+from deck_engine import DeckSession
+
+# Spectators count as watching for this long after their last check
+VIEWER_TIMEOUT = 10.0
+
+# Rooms without any activity for this long are closed when a room is created
+ROOM_IDLE_SECONDS = 6 * 3600
+
+
+class Room:
+    """
+    A DeckSession shared between sessions.
+
+    The session's operations are atomic and bump its version, so viewers
+    only need to compare one integer to know whether anything changed since
+    they last rendered the room.
+    """
+
+    def __init__(self, room_id: str, session: DeckSession):
+        self.room_id = room_id
+        self.session = session
+        self.last_active = time.monotonic()
+        self._offset = 0
+        self._viewers: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Version of the room; changes with every operation of its session."""
+        return self._offset + self.session.version
+
+    def set_session(self, session: DeckSession):
+        """Show another session in the room (the host switched decks)."""
+        self._offset = self.version + 1 - session.version
+        self.session = session
+        self.last_active = time.monotonic()
+
+    def touch(self, viewer_id: Optional[str] = None):
+        """Record activity in the room, and that a viewer is still watching."""
+        now = time.monotonic()
+        self.last_active = now
+        if viewer_id is not None:
+            with self._lock:
+                self._viewers[viewer_id] = now
+
+    def viewer_count(self) -> int:
+        """Number of viewers that checked in within VIEWER_TIMEOUT seconds."""
+        cutoff = time.monotonic() - VIEWER_TIMEOUT
+        with self._lock:
+            for viewer_id, seen in list(self._viewers.items()):
+                if seen < cutoff:
+                    del self._viewers[viewer_id]
+            return len(self._viewers)
+
+
+_rooms: Dict[str, Room] = {}
+_rooms_lock = threading.Lock()
+
+
+def create_room(session: DeckSession) -> Room:
+    """
+    Share a session as a new room.
+
+    Rooms that have been idle for ROOM_IDLE_SECONDS are closed first.
+
+    Args:
+        session: The host's session, which becomes the room's engine
+
+    Returns:
+        The new room
+    """
+    cutoff = time.monotonic() - ROOM_IDLE_SECONDS
+    with _rooms_lock:
+        for room_id, room in list(_rooms.items()):
+            if room.last_active < cutoff:
+                del _rooms[room_id]
+        room_id = secrets.token_urlsafe(6)
+        while room_id in _rooms:
+            room_id = secrets.token_urlsafe(6)
+        room = _rooms[room_id] = Room(room_id, session)
+    return room
+
+
+def get_room(room_id: str) -> Optional[Room]:
+    """Return an open room, or None."""
+    with _rooms_lock:
+        return _rooms.get(room_id)
+
+
+def close_room(room_id: str):
+    """Close a room; its viewers fall back to their own sessions."""
+    with _rooms_lock:
+        _rooms.pop(room_id, None)
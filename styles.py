@@ -3,16 +3,29 @@ CSS styles for the card selector application.
 Clean professional theming with gradients, shadows, and animations.
 """
 
-import uuid
-import time
+import functools
+import hashlib
+import html
+import os
+import re
+from typing import Iterable, Optional, Sequence, Tuple
 
-def get_card_styles() -> str:
-    """Return CSS styles for card display - PROFESSIONAL EDITION."""
+from profiling import instrument
+
+# Google Fonts - Clean & Professional
+FONTS_URL = 'https://fonts.googleapis.com/css2?family=Poppins:wght@400;600;700&family=Inter:wght@400;500;600&display=swap'
+
+# Directory served by Streamlit at ``app/static`` when static serving is on
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_URL = 'app/static'
+
+# Link markup for the published stylesheet, built once per process
+_stylesheet_link: Optional[str] = None
+
+
+def get_stylesheet() -> str:
+    """Return the raw CSS for card display - PROFESSIONAL EDITION."""
     return """
-    <style>
-    /* Import Google Fonts - Clean & Professional */
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;600;700&family=Inter:wght@400;500;600&display=swap');
-    
     /* Hide Streamlit branding */
     #MainMenu {visibility: hidden;}
     footer {visibility: hidden;}
@@ -114,6 +127,15 @@ def get_card_styles() -> str:
         word-wrap: break-word;
     }
     
+    .card-category {
+        margin-top: 14px;
+        font-family: 'Inter', sans-serif;
+        font-size: 0.8rem;
+        text-transform: uppercase;
+        letter-spacing: 2px;
+        color: rgba(165, 180, 252, 0.7);
+    }
+    
     /* Card decoration lines */
     .card-decoration {
         position: absolute;
@@ -206,6 +228,85 @@ def get_card_styles() -> str:
         animation: discardCard 0.5s ease-in forwards !important;
     }
     
+    /* Consecutive draws alternate between two copies of each animation
+       (the caller's replay flag, flipped by the game's draw count; see
+       render_card): a changed animation name restarts it even when the
+       browser reuses the element */
+    @keyframes cardAppearReplay {
+        0% { 
+            opacity: 0; 
+            transform: translateY(60px) rotateX(-20deg) scale(0.9); 
+        }
+        100% { 
+            opacity: 1; 
+            transform: translateY(0) rotateX(0deg) scale(1); 
+        }
+    }
+    
+    @keyframes discardCardReplay {
+        0% { 
+            opacity: 1; 
+            transform: translateX(0) rotateZ(0deg) scale(1); 
+        }
+        100% { 
+            opacity: 0; 
+            transform: translateX(400px) translateY(-50px) rotateZ(30deg) scale(0.5); 
+        }
+    }
+    
+    .game-card.replay {
+        animation-name: cardAppearReplay;
+    }
+    
+    .discarding.replay {
+        animation-name: discardCardReplay !important;
+    }
+    
+    /* Card back fades in over the discarded card when its animation ends */
+    .discard-stage {
+        position: relative;
+    }
+    
+    .discard-stage .card-back-reveal {
+        position: absolute;
+        top: 0;
+        left: 0;
+        right: 0;
+        bottom: 0;
+        opacity: 0;
+        animation: cardBackReveal 0.2s ease-out 0.5s forwards;
+    }
+    
+    @keyframes cardBackReveal {
+        0% { opacity: 0; }
+        100% { opacity: 1; }
+    }
+    
+    /* Batch draw grid */
+    .card-grid {
+        display: grid;
+        grid-template-columns: repeat(auto-fill, minmax(120px, 1fr));
+        gap: 8px;
+        max-height: 480px;
+        overflow-y: auto;
+        padding: 10px;
+        contain: content;
+    }
+    
+    .mini-card {
+        font-family: 'Inter', sans-serif;
+        font-size: 0.8rem;
+        color: #e0e0e0;
+        text-align: center;
+        padding: 12px 8px;
+        background: linear-gradient(145deg, #1e1e2e 0%, #2d2d44 100%);
+        border: 1px solid rgba(99, 102, 241, 0.3);
+        border-radius: 10px;
+        word-wrap: break-word;
+        content-visibility: auto;
+        contain-intrinsic-size: 44px;
+    }
+    
     /* Counter styling */
     .deck-counter {
         background: linear-gradient(135deg, rgba(99, 102, 241, 0.15), rgba(139, 92, 246, 0.2));
@@ -314,9 +415,38 @@ def get_card_styles() -> str:
         background: rgba(99, 102, 241, 0.1);
         border-radius: 8px;
         border-left: 3px solid #6366f1;
+    }
+    
+    .discard-item.new {
         animation: slideIn 0.3s ease-out;
     }
     
+    .discard-more {
+        color: rgba(255, 255, 255, 0.3);
+    }
+    
+    .discard-empty {
+        font-style: italic;
+    }
+    
+    /* Paged discard history */
+    .discard-history {
+        font-family: 'Inter', sans-serif;
+        font-size: 0.85rem;
+        color: rgba(255, 255, 255, 0.6);
+    }
+    
+    .history-row {
+        padding: 4px 8px;
+        border-bottom: 1px solid rgba(99, 102, 241, 0.1);
+    }
+    
+    .history-index {
+        display: inline-block;
+        min-width: 4.5em;
+        color: rgba(165, 180, 252, 0.6);
+    }
+    
     @keyframes slideIn {
         0% { opacity: 0; transform: translateX(-20px); }
         100% { opacity: 1; transform: translateX(0); }
@@ -357,102 +487,217 @@ def get_card_styles() -> str:
         font-family: 'Poppins', sans-serif !important;
         color: #a5b4fc !important;
     }
+    """
+
+
+@instrument
+def get_card_styles() -> str:
+    """Return the stylesheet as an inline ``<style>`` block."""
+    return f"""
+    <style>
+    @import url('{FONTS_URL}');
+    {get_stylesheet()}
     </style>
     """
 
 
-def render_card(card_name: str) -> str:
-    """Render HTML for a face-up card with the given name."""
-    card_id = f"card-{uuid.uuid4()}"
-    timestamp = int(time.time() * 1000)
+def minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace from CSS."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};:,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def publish_stylesheet(static_dir: str = STATIC_DIR) -> str:
+    """
+    Write the minified stylesheet to a content-hashed static file.
     
-    return f"""
-    <div id="{card_id}" class="card-container" data-timestamp="{timestamp}">
-        <div class="game-card" style="animation: cardAppear 0.6s cubic-bezier(0.34, 1.56, 0.64, 1) forwards;">
+    The file name changes whenever the CSS does, so a cached copy is never
+    stale. Streamlit's static route sends no Cache-Control header, though,
+    only ETag and Last-Modified: browsers cache the file heuristically and
+    revalidate it with a cheap 304 rather than keeping it for good.
+    Existing files are left untouched.
+    
+    Returns:
+        The file name written into ``static_dir``
+    """
+    css = minify_css(get_stylesheet())
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:12]
+    filename = f"cards.{digest}.css"
+    path = os.path.join(static_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(static_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(css)
+        os.replace(tmp_path, path)
+    return filename
+
+
+@instrument
+def get_stylesheet_link(refresh: bool = False) -> str:
+    """
+    Return ``<link>`` tags for the fonts and the published stylesheet.
+    
+    The stylesheet is published on first use and the markup is cached for
+    the life of the process, so each rerun only sends a couple of tags.
+    
+    Args:
+        refresh: Republish the stylesheet (e.g. after editing styles)
+    """
+    global _stylesheet_link
+    if _stylesheet_link is None or refresh:
+        filename = publish_stylesheet()
+        _stylesheet_link = (
+            f'<link rel="stylesheet" href="{FONTS_URL}">'
+            f'<link rel="stylesheet" href="{STATIC_URL}/{filename}">'
+        )
+    return _stylesheet_link
+
+
+def _compile(template: str):
+    """
+    Compile an HTML template once: strip the layout whitespace and return its
+    bound ``str.format``, so rendering is a single substitution.
+    """
+    return re.sub(r'\n\s*', '', template.strip()).format
+
+
+# Card names are escaped once and reused: decks repeat names and the discard
+# pile re-renders the same ones on every rerun
+_escape = functools.lru_cache(maxsize=4096)(html.escape)
+
+_CARD_TEMPLATE = _compile("""
+    <div class="card-container">
+        <div class="game-card{replay}">
             <div class="card-decoration"></div>
             <div class="card-content">
-                <div class="card-name">{card_name}</div>
+                <div class="card-name">{name}</div>
+                {category}
             </div>
         </div>
     </div>
-    <script>
-        (function() {{
-            var card = document.getElementById('{card_id}');
-            if (card) {{
-                var gameCard = card.querySelector('.game-card');
-                if (gameCard) {{
-                    gameCard.style.animation = 'none';
-                    gameCard.offsetHeight;
-                    gameCard.style.animation = 'cardAppear 0.6s cubic-bezier(0.34, 1.56, 0.64, 1) forwards';
-                }}
-            }}
-        }})();
-    </script>
-    """
+""")
 
+_CATEGORY_TEMPLATE = _compile('<div class="card-category">{}</div>')
 
-def render_card_discarding(card_name: str) -> str:
-    """Render HTML for a card being discarded with animation."""
-    card_id = f"card-{uuid.uuid4()}"
-    timestamp = int(time.time() * 1000)
-    
-    return f"""
-    <div id="{card_id}" class="card-container" data-timestamp="{timestamp}">
-        <div class="game-card discarding">
-            <div class="card-decoration"></div>
-            <div class="card-content">
-                <div class="card-name">{card_name}</div>
+_CARD_BACK_INNER = _compile("""
+    <div class="card-back">
+        <div class="card-back-pattern"></div>
+        <div class="card-back-symbol">?</div>
+    </div>
+""")()
+
+_CARD_BACK_HTML = f'<div class="card-container">{_CARD_BACK_INNER}</div>'
+
+_DISCARDING_TEMPLATE = _compile("""
+    <div class="discard-stage">
+        <div class="card-container">
+            <div class="game-card discarding{replay}">
+                <div class="card-decoration"></div>
+                <div class="card-content">
+                    <div class="card-name">{name}</div>
+                </div>
             </div>
         </div>
+        <div class="card-container card-back-reveal">{back}</div>
     </div>
-    <script>
-        (function() {{
-            var card = document.getElementById('{card_id}');
-            if (card) {{
-                var gameCard = card.querySelector('.game-card');
-                if (gameCard) {{
-                    gameCard.style.animation = 'none';
-                    gameCard.offsetHeight;
-                    gameCard.style.animation = 'discardCard 0.5s ease-in forwards';
-                }}
-            }}
-        }})();
-    </script>
+""")
+
+_DISCARD_ITEM_TEMPLATE = _compile('<div class="discard-item">{}</div>')
+_NEW_DISCARD_ITEM_TEMPLATE = _compile('<div class="discard-item new">{}</div>')
+
+
+@instrument
+def render_card(card_name: str, category: Optional[str] = None, replay: bool = False) -> str:
+    """
+    Render HTML for a face-up card with the given name and optional category.
+
+    Args:
+        card_name: Name of the card
+        category: Optional category shown under the name
+        replay: Use the ``replay`` copy of the card animation. The browser
+            restarts an animation only when its name changes, so callers
+            flip this on every new card (e.g. with the parity of a draw
+            counter) and keep it while the same card is re-rendered.
+    """
+    return _CARD_TEMPLATE(
+        replay=' replay' if replay else '',
+        name=_escape(card_name),
+        category=_CATEGORY_TEMPLATE(_escape(category)) if category else ''
+    )
+
+
+@instrument
+def render_card_discarding(card_name: str, replay: bool = False) -> str:
+    """
+    Render HTML for a card being discarded, revealing the card back once it is gone.
+
+    Args:
+        card_name: Name of the card
+        replay: Use the ``replay`` copy of the animation (see render_card)
     """
+    return _DISCARDING_TEMPLATE(
+        replay=' replay' if replay else '',
+        name=_escape(card_name),
+        back=_CARD_BACK_INNER
+    )
 
 
+@instrument
 def render_card_back() -> str:
     """Render HTML for a card back (placeholder when no card selected)."""
-    return """
-    <div class="card-container">
-        <div class="card-back">
-            <div class="card-back-pattern"></div>
-            <div class="card-back-symbol">?</div>
-        </div>
-    </div>
-    """
+    return _CARD_BACK_HTML
 
 
-def render_discard_item(card_name: str) -> str:
-    """Render HTML for a discard pile item with animation."""
-    item_id = f"discard-{uuid.uuid4()}"
-    return f"""
-    <div id="{item_id}" class="discard-item" style="animation: slideIn 0.3s ease-out forwards;">
-        {card_name}
-    </div>
-    <script>
-        (function() {{
-            var item = document.getElementById('{item_id}');
-            if (item) {{
-                item.style.animation = 'none';
-                item.offsetHeight;
-                item.style.animation = 'slideIn 0.3s ease-out forwards';
-            }}
-        }})();
-    </script>
+@instrument
+def render_discard_item(card_name: str, new: bool = False) -> str:
+    """Render HTML for a discard pile item; new items slide in."""
+    template = _NEW_DISCARD_ITEM_TEMPLATE if new else _DISCARD_ITEM_TEMPLATE
+    return template(_escape(card_name))
+
+
+@instrument
+def render_discard_pile(recent: Sequence[str], total: int, new_count: int = 0) -> str:
+    """
+    Render the discard pile panel as a single HTML block.
+    
+    Args:
+        recent: Most recently discarded card names, newest first
+        total: Total number of discarded cards
+        new_count: How many of ``recent`` were discarded since the last render
     """
+    if recent:
+        items = ''.join(
+            render_discard_item(name, new=index < new_count)
+            for index, name in enumerate(recent)
+        )
+        if total > len(recent):
+            items += f'<div class="discard-item discard-more">... and {total - len(recent)} more</div>'
+    else:
+        items = '<div class="discard-item discard-empty">No cards discarded yet</div>'
+    return f'<div class="discard-pile"><div class="discard-title">🗑️ Discard Pile</div>{items}</div>'
+
+
+@instrument
+def render_discard_history(entries: Iterable[Tuple[int, str]]) -> str:
+    """Render one page of the discard history from (position, name) pairs."""
+    rows = ''.join(
+        f'<div class="history-row"><span class="history-index">#{position}</span>{_escape(name)}</div>'
+        for position, name in entries
+    )
+    return f'<div class="discard-history">{rows}</div>'
+
+
+@instrument
+def render_card_grid(card_names: Iterable[str]) -> str:
+    """Render HTML for a batch of drawn cards as one compact grid."""
+    items = ''.join(f'<div class="mini-card">{_escape(name)}</div>' for name in card_names)
+    return f'<div class="card-grid">{items}</div>'
 
 
+@instrument
 def render_deck_counter(remaining: int, total: int) -> str:
     """Render HTML for the deck counter."""
     return f"""
@@ -0,0 +1,49 @@
+"""
+Tests for deck_engine: the atomic operation wrapper of DeckSession, and DeckShelf.
+
+Run with ``python -m pytest -q`` from the repository root.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_engine import DeckSession, DeckShelf, VersionConflict  # noqa: E402
+from deck_utils import load_deck_table  # noqa: E402
+
+
+def make_session() -> DeckSession:
+    return DeckSession(load_deck_table("\n".join(f"Card {i} | {i + 1}" for i in range(20))), seed=1)
+
+
+def test_operations_accept_keyword_arguments():
+    session = make_session()
+    session.load(session.table, weighted=True)
+    assert session.weighted
+    assert len(session.draw_many(count=5)) == 5
+    session.reseed(seed=9)
+    assert session.seed == 9
+
+
+def test_expected_version_with_keyword_arguments():
+    session = make_session()
+    version = session.version
+    assert len(session.draw_many(count=2, expected_version=version)) == 2
+    with pytest.raises(VersionConflict):
+        session.draw_many(count=2, expected_version=version)
+    assert session.remaining == 18
+
+
+def test_switch_to_a_game_that_cannot_be_restored():
+    games = {'game-b': make_session()}
+    decks = DeckShelf(make_session(), 'Main', 'game-a', session_loader=games.get)
+    decks.add('loot', 'game-b')
+    decks.add('gone', 'game-c')
+    with pytest.raises(LookupError):
+        decks.switch('gone')
+    assert decks.active == 'Main'
+    assert decks.switch('loot') is games['game-b']
+    assert [name for name, *_ in decks.listing()] == ['Main', 'loot', 'gone']
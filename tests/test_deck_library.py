@@ -0,0 +1,33 @@
+"""
+Tests for deck_library: the binary index round trip.
+
+Run with ``python -m pytest -q`` from the repository root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_library import DeckLibrary, read_index, write_index  # noqa: E402
+from deck_utils import parse_deck_table  # noqa: E402
+
+CSV_DECK = "name,weight,category\nKing,3,Royals\nWolf,1,\nKing,2,Royals\nÉlan,1,Spirits ✨\n"
+
+
+def test_index_keeps_names_weights_and_categories(tmp_path):
+    table = parse_deck_table(CSV_DECK, 'deck.csv', weighted=True, category_column='category')
+    write_index(table, str(tmp_path / 'deck.deck'))
+    mapped = read_index(str(tmp_path / 'deck.deck'))
+    assert list(mapped.names) == list(table.names)
+    assert list(mapped.card_ids) == list(table.card_ids)
+    assert list(mapped.weights) == list(table.weights)
+    assert [mapped.category(i) for i in range(len(mapped.names))] == ['Royals', None, 'Spirits ✨']
+
+
+def test_library_reads_csv_categories_and_empty_decks(tmp_path):
+    (tmp_path / 'cats.csv').write_text(CSV_DECK, encoding='utf-8')
+    (tmp_path / 'empty.txt').write_text("# nothing here\n", encoding='utf-8')
+    library = DeckLibrary(str(tmp_path), str(tmp_path / 'index'))
+    assert library.open('cats.csv').category(0) == 'Royals'
+    assert len(library.open('empty.txt')) == 0
@@ -0,0 +1,55 @@
+"""
+Tests for deck_utils: detecting the header row of CSV deck files.
+
+Run with ``python -m pytest -q`` from the repository root.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_utils import iter_csv_cards, parse_deck_file  # noqa: E402
+
+
+@pytest.mark.parametrize('text, cards', [
+    ("Ace of Spades,Spades\nKing of Hearts,Hearts\nQueen of Clubs,Clubs\n",
+     ['Ace of Spades', 'King of Hearts', 'Queen of Clubs']),
+    ("Alice,Red\nBob,Blue\n", ['Alice', 'Bob']),
+    # Without a known header word the first row is a card
+    ("Player,Team\nAlice,Red\nBob,Blue\nCarol,Red\n", ['Player', 'Alice', 'Bob', 'Carol']),
+    ("# comment\nSolo\n", ['Solo']),
+])
+def test_rows_without_header_signals_are_cards(text, cards):
+    assert parse_deck_file(text, 'deck.csv') == cards
+
+
+@pytest.mark.parametrize('text', [
+    "Name,Category\nAlice,Red\nBob,Blue\n",
+    "Player,Team,Count\nAlice,Red,2\nBob,Blue,1\n",
+    "# comment\ncard\nAlice\nBob\n",
+])
+def test_known_header_word_is_detected(text):
+    assert parse_deck_file(text, 'deck.csv') == ['Alice', 'Bob']
+
+
+def test_non_numeric_weight_is_a_header():
+    cards = list(iter_csv_cards("Item,Odds\nAlice,3\nBob,1\n", weight_column=1))
+    assert [(card.name, card.weight) for card in cards] == [('Alice', 3.0), ('Bob', 1.0)]
+
+
+def test_numeric_weight_is_not_a_header():
+    cards = list(iter_csv_cards("Alice,3\nBob,1\n", weight_column=1))
+    assert [card.name for card in cards] == ['Alice', 'Bob']
+
+
+def test_explicit_has_header():
+    text = "Player,Team\nAlice,Red\nBob,Blue\n"
+    assert parse_deck_file(text, 'deck.csv', has_header=True) == ['Alice', 'Bob']
+    assert parse_deck_file("Name,Team\nAlice,Red\n", 'deck.csv', has_header=False) == ['Name', 'Alice']
+
+
+def test_named_column_implies_header():
+    assert parse_deck_file("Player,Team\nAlice,Red\n", 'deck.csv', name_column='team') == ['Red']
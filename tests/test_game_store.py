@@ -0,0 +1,149 @@
+"""
+Tests for game_store: several writers on one game, and replaying its log.
+
+Run with ``python -m pytest -q`` from the repository root.
+"""
+
+import gc
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deck_engine import DeckSession, VersionConflict  # noqa: E402
+from deck_utils import load_deck_table  # noqa: E402
+from game_store import GameInUse, GameStore  # noqa: E402
+
+OPERATIONS = ('draw', 'draw', 'discard', 'draw_many', 'undo', 'reset')
+
+
+def make_table(cards: int = 200, weighted: bool = False):
+    text = "\n".join(f"Card {i % 150} | {i % 4 + 1}" for i in range(cards))
+    return load_deck_table(text, weighted=weighted)
+
+
+def state(session: DeckSession) -> tuple:
+    with session.lock:
+        return (session.current_card, list(session.discard_pile), session.remaining,
+                session.draw_count, session.can_undo)
+
+
+def play(session: DeckSession, rng: random.Random, cas: bool = False):
+    """Apply one random operation, the way a tab's button click would."""
+    op = rng.choice(OPERATIONS)
+    args = (rng.randint(1, 6),) if op == 'draw_many' else ()
+    try:
+        if cas:
+            getattr(session, op)(*args, expected_version=session.version)
+        else:
+            getattr(session, op)(*args)
+    except VersionConflict:
+        pass
+
+
+def assert_replays(path: str, game_id: str, live: DeckSession):
+    """A fresh store rebuilds exactly the live state, and draws the same cards next."""
+    replayed = GameStore(path).load_game(game_id)
+    assert replayed is not None
+    assert state(replayed) == state(live)
+    with live.lock:
+        live.journal = None  # keep the log as it was
+        assert [live.draw() for _ in range(10)] == [replayed.draw() for _ in range(10)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = GameStore(str(tmp_path / 'games.db'), snapshot_every=7)
+    yield store
+    store.close()
+
+
+def test_open_game_shares_one_live_session(store):
+    game_id = store.create_game()
+    first = store.open_game(game_id, create=True)
+    assert store.open_game(game_id) is first
+
+
+def test_open_game_without_events(store):
+    assert store.open_game(store.create_game()) is None
+
+
+def test_attach_refuses_a_second_session(store):
+    game_id = store.create_game()
+    live = store.open_game(game_id, create=True)
+    with pytest.raises(GameInUse):
+        store.attach(DeckSession(), game_id)
+    store.attach(live, game_id)  # reattaching the live session is fine
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+def test_interleaved_tabs_replay(store, weighted):
+    game_id = store.create_game()
+    host = store.open_game(game_id, create=True)
+    host.load(make_table(weighted=weighted), weighted)
+
+    # A second tab opening the same game joins the same session
+    tabs = [host, store.open_game(game_id)]
+    rng = random.Random(7)
+    for _ in range(300):
+        play(rng.choice(tabs), rng, cas=True)
+
+    assert_replays(store.path, game_id, host)
+
+
+@pytest.mark.parametrize('cas', [False, True])
+def test_concurrent_writers_replay(store, cas):
+    game_id = store.create_game()
+    live = store.open_game(game_id, create=True)
+    live.load(make_table(1000))
+    errors = []
+
+    def tab(seed: int):
+        try:
+            session = store.open_game(game_id)
+            assert session is live
+            rng = random.Random(seed)
+            for _ in range(300):
+                play(session, rng, cas)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=tab, args=(seed,)) for seed in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert_replays(store.path, game_id, live)
+
+
+def test_forgotten_session_reloads_from_log(store):
+    game_id = store.create_game()
+    session = store.open_game(game_id, create=True)
+    session.load(make_table())
+    rng = random.Random(3)
+    for _ in range(50):
+        play(session, rng)
+    expected = state(session)
+
+    del session
+    gc.collect()
+    reopened = store.open_game(game_id)
+    assert reopened is not None
+    assert state(reopened) == expected
+
+
+def test_shelf_is_found_from_any_of_its_games(store):
+    entries = [('Main', 'game-a', 20, 21), ('loot', 'game-b', 3, 3)]
+    store.save_shelf('game-a', entries)
+    assert store.load_shelf('game-b') == ('game-a', entries)
+    assert store.load_shelf('game-c') is None
+
+    store.save_shelf('game-a', entries[:1])
+    assert store.load_shelf('game-b') is None
+    assert store.load_shelf('game-a') == ('game-a', entries[:1])